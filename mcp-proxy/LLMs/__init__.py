@@ -3,7 +3,16 @@
 # response_limit: int
 # context_len: int
 
-# def query_llm(self, messages: list, tools: list): 
+# async def query_llm(self, messages: list, tools: list): 
+    # Must be cancellable: when the client request is cancelled, the in-progress generation should be aborted
+    # A plain `def query_llm` also works (e.g. for an SDK without an async client): MCPClient then runs it in a
+    # bounded thread pool (JARVIS_LLM_THREADS) so other queries and /health are not blocked, but a cancelled
+    # request can no longer abort the generation
+    # messages is the whole conversation: fit it into the adapter's token budget with LLMs.context.fit_messages,
+    # which keeps tool calls with their results. The last message may be a system message telling the LLM to answer
+    # without calling tools (when the query's budget ran out, see MCPClient.process_query_events)
+    # tools is the client's cached tool list: the same list object until the server's tools change,
+    # so the provider-specific schemas can be converted once and reused while `tools is` the last list
     # returns:
         #    {
         #        "llm_response": "<string>", 
@@ -18,8 +27,18 @@
         #            "args": "<tool_function_arguments_2>",
         #            "tool_use_id": "<unique_tool_use_id_2>"
         #            }
-        #        ]
+        #        ],
+        #        "usage": {"prompt_eval_tokens": <int>, "prompt_eval_seconds": <float>, "cached_tokens": <int>}  (optional)
         #    }
+    # usage reports what the prompt cost: tokens evaluated (not counting a cached prefix), the time spent on
+    # them (if the provider says) and tokens read from the provider's prompt cache. Keep the start of the prompt
+    # (system prompt, tool schemas, older messages) byte-identical between calls so the cache can be used
+
+# async def stream_llm(self, messages: list, tools: list):  (optional)
+    # Async generator, same inputs as query_llm. Yields {"type": "token", "text": "<delta>"} as the answer is
+    # generated and finally {"type": "response", "llm_response": ..., "tool_calls": [...]}, with the same fields
+    # query_llm returns. Text that is really a tool call must not be yielded as tokens.
+    # Without it, /query streams each LLM call's whole answer as a single token
 
 # def format_tool_call(self, tool_use_id, tool_name, tool_args):
     # returns:
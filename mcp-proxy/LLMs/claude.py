@@ -1,32 +1,94 @@
-from anthropic import Anthropic
+import json
+import os
+
+from anthropic import AsyncAnthropic
+
+from LLMs.context import TokenCounter, fit_messages, message_text
+
+MODEL = "claude-3-7-sonnet-20250219"
+CACHE_CONTROL = {"type": "ephemeral"} # marks the end of a prompt prefix Anthropic may cache
+NAME = "Jarvis"
+SYSTEM_PROMPT = f"Your name is {NAME}. You are a formal, concise assistant who always refers to the user as sir. You answer in no more than two sentences. Do not ask follow-up questions unless absolutely necessary to understand the current query. Do not offer additional information, suggestions, or clarifications unless directly requested. You are helpful but reserved. If a question cannot be answered without more information, state that clearly and wait for further input. You have access to tools, but you will only use them when the question cannot be answered directly."
+
+def mark_cached(messages: list) -> list:
+    """A copy of messages whose last content block ends a cached prefix"""
+    if not messages:
+        return messages
+    last = messages[-1]
+    content = last['content']
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = [dict(block) for block in content]
+    blocks[-1]["cache_control"] = CACHE_CONTROL
+    return messages[:-1] + [{**last, 'content': blocks}]
 
 class AnthropicAPI:
     def __init__(self):
-        self.anthropic = Anthropic()
+        self.anthropic = AsyncAnthropic() # Async so a cancelled request closes the connection and stops generation
         self.context_len = 128000
         self.response_limit = self.context_len // 20
+        self.tool_schemas = (None, []) # (tool list, Anthropic schemas) of the last conversion
+        self.tool_schemas_text = "" # the schemas as JSON, for counting their tokens
+        # Prompt tokens (system prompt, tool schemas and messages), older turns are dropped beyond this
+        self.context_budget = int(os.getenv("JARVIS_CONTEXT_TOKENS", "32000"))
+        self.trim_step = int(os.getenv("JARVIS_CONTEXT_TRIM_TURNS", "4")) # turns dropped at once, see fit_messages
+        self.token_counter = TokenCounter()
 
-    def query_llm(self, messages: list, tools: list):
+    async def query_llm(self, messages: list, tools: list):
         """Query the Anthropic LLM with given messages and tools"""
+        messages, available_tools, system, prompt_chars = self.prepare(messages, tools)
 
-        NAME = "Jarvis"
-        SYSTEM_PROMPT = f"Your name is {NAME}. You are a formal, concise assistant who always refers to the user as sir. You answer in no more than two sentences. Do not ask follow-up questions unless absolutely necessary to understand the current query. Do not offer additional information, suggestions, or clarifications unless directly requested. You are helpful but reserved. If a question cannot be answered without more information, state that clearly and wait for further input. You have access to tools, but you will only use them when the question cannot be answered directly."
-        
-        # Structure tools for Anthropic API
-        available_tools = [{
-            "name": tool.name,
-            "description": tool.description,
-            "input_schema": tool.inputSchema
-        } for tool in tools]
-
-        response = self.anthropic.messages.create(
-            model="claude-3-7-sonnet-20250219",
+        response = await self.anthropic.messages.create(
+            model=MODEL,
             max_tokens=1000,
             messages=messages,
             tools=available_tools,
-            system=SYSTEM_PROMPT
+            system=system
         )
         print(response)
+        return {**self.parse_response(response), 'usage': self.usage(prompt_chars, response.usage)}
+
+    async def stream_llm(self, messages: list, tools: list):
+        """Like query_llm, but yields the answer's text as it is generated"""
+        messages, available_tools, system, prompt_chars = self.prepare(messages, tools)
+
+        async with self.anthropic.messages.stream(
+            model=MODEL,
+            max_tokens=1000,
+            messages=messages,
+            tools=available_tools,
+            system=system
+        ) as stream:
+            async for text in stream.text_stream:
+                yield {'type': 'token', 'text': text}
+            response = await stream.get_final_message()
+        yield {'type': 'response', **self.parse_response(response), 'usage': self.usage(prompt_chars, response.usage)}
+
+    def prepare(self, messages: list, tools: list):
+        """
+        Fit the messages into the token budget and mark the prompt for prompt caching. The tools, the fixed
+        system prompt and the conversation so far are each the end of a cached prefix, so later agent-loop
+        iterations and turns only pay for what was added since.
+        """
+        available_tools = self.convert_tools(tools)
+        # The Messages API takes no system role, such messages (e.g. a conversation summary) extend the system prompt
+        system = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": CACHE_CONTROL}]
+        system += [{"type": "text", "text": message_text(message)} for message in messages if message.get('role') == 'system']
+        messages = [message for message in messages if message.get('role') != 'system']
+        fixed_text = "".join(block["text"] for block in system) + self.tool_schemas_text
+        messages = fit_messages(messages, self.context_budget - self.token_counter.count(fixed_text), self.token_counter, self.trim_step)
+        prompt_chars = len(fixed_text) + sum(len(message_text(message)) for message in messages)
+        return mark_cached(messages), available_tools, system, prompt_chars
+
+    def usage(self, prompt_chars: int, usage) -> dict:
+        """Prompt tokens processed and read from the prompt cache, also used to calibrate the token estimate"""
+        cached = getattr(usage, 'cache_read_input_tokens', 0) or 0
+        processed = usage.input_tokens + (getattr(usage, 'cache_creation_input_tokens', 0) or 0)
+        self.token_counter.observe(prompt_chars, processed + cached)
+        return {'prompt_eval_tokens': processed, 'cached_tokens': cached}
+
+    def parse_response(self, response) -> dict:
         tool_calls = []
         llm_response = ""
         for content in response.content:
@@ -37,6 +99,19 @@ class AnthropicAPI:
         result = {'llm_response': llm_response, 'tool_calls': tool_calls}
         return result
     
+    def convert_tools(self, tools: list):
+        """Structure tools for Anthropic API, only when the client's (cached) tool list changed"""
+        if tools is not self.tool_schemas[0]:
+            self.tool_schemas = (tools, [{
+                "name": tool.name,
+                "description": tool.description,
+                "input_schema": tool.inputSchema
+            } for tool in tools])
+            self.tool_schemas_text = json.dumps(self.tool_schemas[1])
+            if self.tool_schemas[1]:
+                self.tool_schemas[1][-1]["cache_control"] = CACHE_CONTROL # tools come first in the prompt
+        return self.tool_schemas[1]
+
     def format_tool_call(self, tool_use_id, tool_name, tool_args):
         tool_call = {
                         "role": "assistant",
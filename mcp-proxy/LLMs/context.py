@@ -0,0 +1,147 @@
+import json
+import os
+
+import utils
+
+try:
+    from tokenizers import Tokenizer
+except ImportError: # optional, only needed for exact counts with JARVIS_TOKENIZER
+    Tokenizer = None
+
+MESSAGE_OVERHEAD = 4 # tokens of role markers and separators around each message
+
+def message_text(message: dict) -> str:
+    content = message.get('content', '')
+    return content if isinstance(content, str) else json.dumps(content)
+
+class TokenCounter:
+    """
+    Counts tokens with the model's tokenizer when JARVIS_TOKENIZER points at its tokenizer.json (needs the
+    tokenizers package). Otherwise tokens are estimated from characters, with the characters per token
+    calibrated from the prompt token counts the provider reports for each call (see observe).
+    """
+
+    def __init__(self, chars_per_token: float = 3.0):
+        self.chars_per_token = chars_per_token # conservative until calibrated
+        self.tokenizer = None
+        tokenizer_path = os.getenv("JARVIS_TOKENIZER")
+        if tokenizer_path:
+            if Tokenizer is None:
+                print("JARVIS_TOKENIZER is set but the tokenizers package is not installed, estimating token counts")
+            else:
+                self.tokenizer = Tokenizer.from_file(os.path.expanduser(tokenizer_path))
+
+    def count(self, text: str) -> int:
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+        return int(len(text) / self.chars_per_token) + 1
+
+    def count_message(self, message: dict) -> int:
+        return self.count(message_text(message)) + MESSAGE_OVERHEAD
+
+    def observe(self, chars: int, tokens: int):
+        """Calibrate the estimate with a prompt of chars characters that the model counted as tokens"""
+        if self.tokenizer is not None or tokens <= 0:
+            return
+        ratio = chars / tokens
+        # Prefix-cached prompts report fewer tokens than were sent, ignore implausible ratios
+        if 1.5 <= ratio <= 8.0:
+            self.chars_per_token = 0.8 * self.chars_per_token + 0.2 * ratio
+
+def is_tool_call(message: dict) -> bool:
+    content = message.get('content')
+    if isinstance(content, list):
+        return any(isinstance(block, dict) and block.get('type') == 'tool_use' for block in content)
+    return message.get('role') == 'assistant' and isinstance(content, str) and content.startswith('type=tool_use')
+
+def is_tool_result(message: dict) -> bool:
+    content = message.get('content')
+    if isinstance(content, list):
+        return any(isinstance(block, dict) and block.get('type') == 'tool_result' for block in content)
+    return message.get('role') == 'user' and isinstance(content, str) and content.startswith('type=tool_result')
+
+def group_messages(messages: list[dict]) -> list[list[dict]]:
+    """Split messages into units that are kept or dropped together: a tool call with its result, or one message"""
+    units = []
+    i = 0
+    while i < len(messages):
+        if is_tool_call(messages[i]) and i + 1 < len(messages) and is_tool_result(messages[i + 1]):
+            units.append(messages[i:i + 2])
+            i += 2
+        else:
+            units.append([messages[i]])
+            i += 1
+    return units
+
+def starts_turn(unit: list[dict]) -> bool:
+    """A user message that is not a tool result, where a trimmed conversation may begin"""
+    return unit[0].get('role') == 'user' and not is_tool_result(unit[0])
+
+def shorten_result(message: dict, max_tokens: int, counter: TokenCounter) -> dict:
+    """A copy of a tool result message with its text cut to about max_tokens"""
+    tokens = counter.count(message_text(message))
+    if tokens <= max_tokens:
+        return message
+
+    def cut(text: str) -> str:
+        return utils.cap_start(text, max(20, int(len(text) * max_tokens / tokens)))
+
+    content = message['content']
+    if isinstance(content, str):
+        return {**message, 'content': cut(content)}
+    blocks = [{**block, 'content': cut(block['content'])} if isinstance(block, dict) and isinstance(block.get('content'), str) else block for block in content]
+    return {**message, 'content': blocks}
+
+def fit_messages(messages: list[dict], budget: int, counter: TokenCounter, trim_step: int = 1) -> list[dict]:
+    """
+    The most recent messages that fit in budget tokens. Whole tool call/result pairs are kept or dropped,
+    and the result starts at a user turn. The current turn (the last user query and what follows it) is
+    always kept: when it alone is over budget its oldest tool pairs are dropped, then its tool results shortened.
+    Leading system messages (e.g. a conversation summary) are always kept too.
+    Older turns are dropped trim_step turns at a time, so the start of the prompt (which the provider
+    may have cached) stays the same for several turns instead of moving with every new turn.
+    """
+    pinned = 0
+    while pinned < len(messages) and messages[pinned].get('role') == 'system':
+        pinned += 1
+    if pinned:
+        budget -= sum(counter.count_message(message) for message in messages[:pinned])
+        return messages[:pinned] + fit_messages(messages[pinned:], budget, counter, trim_step)
+
+    units = group_messages(messages)
+    costs = [sum(counter.count_message(message) for message in unit) for unit in units]
+    if sum(costs) <= budget:
+        return messages
+
+    current = max((i for i, unit in enumerate(units) if starts_turn(unit)), default=0)
+    kept = list(range(current, len(units)))
+    used = sum(costs[i] for i in kept)
+    # Over budget within the current turn: drop its oldest tool pairs, keeping the query and the latest pair
+    for i in range(current + 1, len(units) - 1):
+        if used <= budget:
+            break
+        if len(units[i]) == 2:
+            kept.remove(i)
+            used -= costs[i]
+    pairs = [i for i in kept if len(units[i]) == 2]
+    if used > budget and pairs:
+        # Still over: the remaining tool results share what the rest of the turn leaves
+        share = max(0, budget - (used - sum(costs[i] for i in pairs))) // len(pairs)
+        for i in pairs:
+            if costs[i] > share:
+                call, result = units[i]
+                units[i] = [call, shorten_result(result, share - counter.count_message(call) - MESSAGE_OVERHEAD, counter)]
+                used += sum(counter.count_message(message) for message in units[i]) - costs[i]
+
+    # Then add earlier turns, newest first, while they fit
+    start = current
+    for i in range(current - 1, -1, -1):
+        if used + costs[i] > budget:
+            break
+        used += costs[i]
+        start = i
+    # Begin at a turn (not in the middle of one) whose number is a multiple of trim_step
+    turn_starts = [i for i in range(current) if starts_turn(units[i])]
+    start = next((i for number, i in enumerate(turn_starts) if i >= start and number % trim_step == 0), current)
+
+    return [message for i in list(range(start, current)) + kept for message in units[i]]
@@ -1,5 +1,12 @@
+import json
+import os
+
 import ollama
 import utils
+from LLMs.context import TokenCounter, fit_messages
+
+TOOL_USE_PREFIX = 'type=tool_use'
+KEEP_ALIVE = "24h" # sent with every request, an unloaded model loses its cached prompt prefix
 
 class OllamaAPI:
     def __init__(self):
@@ -7,55 +14,108 @@ class OllamaAPI:
         self.context_len = 40000
         self.response_limit = self.context_len // 10
         self.tool_use_id_counter = 0
+        self.client = ollama.AsyncClient() # Async so a cancelled request closes the connection and stops generation
+        self.tool_schemas = (None, []) # (tool list, Ollama schemas) of the last conversion
+        self.tool_schemas_text = "" # the schemas as JSON, for counting their tokens
+        # Prompt tokens (tool schemas and messages), older turns are dropped beyond this to bound prefill time
+        self.context_budget = int(os.getenv("JARVIS_CONTEXT_TOKENS", "8192"))
+        self.trim_step = int(os.getenv("JARVIS_CONTEXT_TRIM_TURNS", "4")) # turns dropped at once, see fit_messages
+        self.token_counter = TokenCounter()
         load_result = {'done': False}
         try:
             print(f"trying to load model: {self.model}")
-            load_result = ollama.chat(model=self.model, keep_alive="24h")
+            load_result = ollama.chat(model=self.model, keep_alive=KEEP_ALIVE)
         except ollama.ResponseError as e:
             if e.status_code == 404:
                 print("pulling model")
                 ollama.pull(self.model)
-                load_result = ollama.chat(model=self.model, keep_alive="24h")
+                load_result = ollama.chat(model=self.model, keep_alive=KEEP_ALIVE)
         if (load_result['done'] != True):
             print(f'Error loading model: {self.model}')
 
-    def query_llm(self, messages: list, tools: list):
+    async def query_llm(self, messages: list, tools: list):
         """Query the local ollama LLM with given messages and tools"""
+        messages, available_tools = self.prepare(messages, tools)
+        response = await self.client.chat(model=self.model,think=False, messages=messages, tools=available_tools, keep_alive=KEEP_ALIVE)
+        return {**self.parse_response(response.message.content, response.message.tool_calls), 'usage': self.usage(response)}
+
+    async def stream_llm(self, messages: list, tools: list):
+        """Like query_llm, but yields the answer's text as it is generated"""
+        messages, available_tools = self.prepare(messages, tools)
+        stream = await self.client.chat(model=self.model,think=False, messages=messages, tools=available_tools, stream=True, keep_alive=KEEP_ALIVE)
+        usage = None
+        content = ""
+        tool_calls = []
+        streamed = 0 # characters of content already yielded
+        async for chunk in stream:
+            if chunk.done:
+                usage = self.usage(chunk)
+            if chunk.message.tool_calls:
+                tool_calls.extend(chunk.message.tool_calls)
+            if not chunk.message.content:
+                continue
+            content += chunk.message.content
+            # Hold back text that may still turn out to be a tool call written into the content
+            if content.startswith(TOOL_USE_PREFIX[:len(content)]):
+                continue
+            yield {'type': 'token', 'text': content[streamed:]}
+            streamed = len(content)
+        if streamed < len(content) and not content.startswith(TOOL_USE_PREFIX):
+            yield {'type': 'token', 'text': content[streamed:]}
+        yield {'type': 'response', **self.parse_response(content, tool_calls), 'usage': usage}
+
+    def prepare(self, messages: list, tools: list):
         self.tool_use_id_counter += 1
         if self.tool_use_id_counter > 10000:
             self.tool_use_id_counter = 1
 
-        # Structure tools for Ollama
-        available_tools = [{
-            'type': 'function',
-            'function': {
-                'name': tool.name,
-                'description': tool.description,
-                'parameters': {
-                    'type': tool.inputSchema.get('type', ''),
-                    'required': tool.inputSchema.get('required', []),
-                    'properties': tool.inputSchema.get('properties', '')
-                }
-            }
-        } for tool in tools]
+        available_tools = self.convert_tools(tools)
+
+        # The token estimate is not calibrated with prompt_eval_count, which leaves out the cached prefix
+        tools_tokens = self.token_counter.count(self.tool_schemas_text)
+        messages = fit_messages(messages, self.context_budget - tools_tokens, self.token_counter, self.trim_step)
+        return messages, available_tools
 
-        if (len(messages) > 10):
-            messages = messages[len(messages) - 10:]
+    def usage(self, response) -> dict:
+        """Prompt tokens Ollama evaluated (not counting the cached prefix) and the time it took"""
+        return {
+            'prompt_eval_tokens': response.prompt_eval_count or 0,
+            'prompt_eval_seconds': (response.prompt_eval_duration or 0) / 1e9,
+        }
 
-        response = ollama.chat(model=self.model,think=False, messages=messages, tools=available_tools)
+    def parse_response(self, content: str, message_tool_calls) -> dict:
         tool_calls = []
         llm_response = ""
-        if response.message.tool_calls:
-            tool_calls = [{'name': tool.function.name, 'args': tool.function.arguments, 'tool_use_id': str(self.tool_use_id_counter) } for tool in response.message.tool_calls]
+        if message_tool_calls:
+            # One id per call, so the results of parallel calls (even to the same tool) can be told apart
+            tool_calls = [{'name': tool.function.name, 'args': tool.function.arguments, 'tool_use_id': f"{self.tool_use_id_counter}.{index}"} for index, tool in enumerate(message_tool_calls)]
         # Sometimes model returns tool call in content message
-        if response.message.content and response.message.content[:13] == 'type=tool_use':
-            info = utils.parse_tool_string(response.message.content)
+        if content and content.startswith(TOOL_USE_PREFIX):
+            info = utils.parse_tool_string(content)
             tool_calls.append({'name': info['name'], 'args': info['input'], 'tool_use_id': info['id']})
         else:
-            llm_response = response.message.content
+            llm_response = content
         result = {'llm_response': llm_response, 'tool_calls': tool_calls}
         return result
 
+    def convert_tools(self, tools: list):
+        """Structure tools for Ollama, only when the client's (cached) tool list changed"""
+        if tools is not self.tool_schemas[0]:
+            self.tool_schemas = (tools, [{
+                'type': 'function',
+                'function': {
+                    'name': tool.name,
+                    'description': tool.description,
+                    'parameters': {
+                        'type': tool.inputSchema.get('type', ''),
+                        'required': tool.inputSchema.get('required', []),
+                        'properties': tool.inputSchema.get('properties', '')
+                    }
+                }
+            } for tool in tools])
+            self.tool_schemas_text = json.dumps(self.tool_schemas[1])
+        return self.tool_schemas[1]
+
     def format_tool_call(self, tool_use_id, tool_name, tool_args):
         tool_call = {
                         "role": "assistant",
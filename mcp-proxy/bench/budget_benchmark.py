@@ -0,0 +1,73 @@
+"""
+Run queries with a scripted LLM that keeps asking for searches (--rounds LLM
+calls with --searches searches each before it answers) and compare the query
+latency without limits to the agent loop's budgets: max LLM calls, max tool
+calls and a deadline. The LLM answers as soon as it is told to (the final
+answer prompt), along with the searches it would still have made.
+
+Run from the mcp-proxy directory:
+    python -m bench.budget_benchmark --rounds 20 --searches 2 --seconds 0.2 --llm-seconds 0.05
+"""
+import argparse
+import asyncio
+import time
+
+import utils
+from bench.tool_calls_benchmark import ScriptedLLM
+from mcp_flow import FINAL_ANSWER_PROMPT, MCPClient
+
+class RunawayLLM(ScriptedLLM):
+    """Asks for more searches on each of its first rounds calls, then answers. Told to answer early, it answers but still asks"""
+
+    def __init__(self, rounds: int, searches: int, seconds: float, llm_seconds: float):
+        super().__init__([])
+        self.rounds = rounds
+        self.searches = searches
+        self.seconds = seconds
+        self.llm_seconds = llm_seconds
+        self.calls = 0
+
+    async def query_llm(self, messages: list, tools: list):
+        self.calls += 1
+        await asyncio.sleep(self.llm_seconds)
+        if self.calls > self.rounds:
+            return {'llm_response': 'Here is what I found, sir.', 'tool_calls': []}
+        tool_calls = [{'name': 'slow_search', 'args': {'query': f'topic {self.calls}.{i}', 'seconds': self.seconds}, 'tool_use_id': f'{self.calls}.{i}'} for i in range(self.searches)]
+        if str(messages[-1]['content']).endswith(FINAL_ANSWER_PROMPT):
+            return {'llm_response': 'Here is what I found so far, sir.', 'tool_calls': tool_calls}
+        return {'llm_response': '', 'tool_calls': tool_calls}
+
+async def main_async(args):
+    unlimited = {'llm_calls': 10 ** 6, 'tool_calls': 10 ** 6, 'seconds': 10.0 ** 6}
+    runs = [
+        ("no limits", unlimited),
+        (f"max {args.llm_calls} LLM calls", {**unlimited, 'llm_calls': args.llm_calls}),
+        (f"max {args.tool_calls} tool calls", {**unlimited, 'tool_calls': args.tool_calls}),
+        (f"deadline {args.deadline:g}s", {**unlimited, 'seconds': args.deadline}),
+    ]
+    llm = RunawayLLM(args.rounds, args.searches, args.seconds, args.llm_seconds)
+    client = MCPClient(llm)
+    client.tool_concurrency = args.searches
+    client.summarizer.model = "" # one-turn conversations, nothing to summarize
+    await client.connect_to_server("bench/stub_server.py")
+    try:
+        for label, budget in runs:
+            llm.calls = 0
+            start = time.perf_counter()
+            response = await client.process_query("Find out everything about the Stark Industries merger", [], budget)
+            elapsed = time.perf_counter() - start
+            tool_calls = sum(1 for message in response['history'] if utils.is_tool_call_note(message))
+            print(f"{label:<20} {elapsed:6.2f}s   {llm.calls:>3} LLM calls  {tool_calls:>3} tool calls   budget exhausted: {response['budget_exhausted']}")
+    finally:
+        await client.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20, help="LLM calls asking for searches before the LLM answers on its own")
+    parser.add_argument("--searches", type=int, default=2, help="searches per LLM call")
+    parser.add_argument("--seconds", type=float, default=0.2, help="how long each search takes")
+    parser.add_argument("--llm-seconds", type=float, default=0.05)
+    parser.add_argument("--llm-calls", type=int, default=8)
+    parser.add_argument("--tool-calls", type=int, default=16)
+    parser.add_argument("--deadline", type=float, default=2.0)
+    asyncio.run(main_async(parser.parse_args()))
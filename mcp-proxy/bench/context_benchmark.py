@@ -0,0 +1,73 @@
+"""
+Grow a synthetic conversation turn by turn (every --tool-every turns one or
+two searches with a --result-chars result each) and compare the prompts sent to
+the LLM by the old "last 10 messages" rule and by the token budget of
+LLMs/context.py: estimated prompt tokens, and how often a tool call was cut off
+from its result.
+Prefill time grows with prompt tokens, so a bounded prompt means bounded prefill.
+
+Run from the mcp-proxy directory:
+    python -m bench.context_benchmark --turns 50 --budget 8192 --result-chars 4000
+"""
+import argparse
+import time
+
+import utils
+from LLMs.context import TokenCounter, fit_messages, group_messages, is_tool_call, is_tool_result
+
+def tool_call(tool_use_id: str, query: str) -> dict:
+    return {'role': 'assistant', 'content': utils.stringify([{'type': 'tool_use', 'id': tool_use_id, 'name': 'search_the_internet', 'input': utils.stringify({'query': query})}])}
+
+def tool_result(tool_use_id: str, result: str) -> dict:
+    return {'role': 'user', 'content': utils.stringify([{'type': 'tool_result', 'tool_use_id': tool_use_id, 'content': result}])}
+
+def last_ten(messages: list[dict], budget: int, counter: TokenCounter) -> list[dict]:
+    return messages[len(messages) - 10:] if len(messages) > 10 else messages
+
+def broken_pairs(messages: list[dict]) -> int:
+    """Tool calls without their result and results without their call"""
+    return sum(1 for unit in group_messages(messages) if len(unit) == 1 and (is_tool_call(unit[0]) or is_tool_result(unit[0])))
+
+def main(args):
+    counter = TokenCounter()
+    strategies = {"last 10": last_ten, "budget": fit_messages}
+    stats = {name: {"tokens": [], "broken": 0, "seconds": 0.0} for name in strategies}
+    messages = []
+
+    def query_llm(messages: list[dict]):
+        for name, strategy in strategies.items():
+            start = time.perf_counter()
+            prompt = strategy(messages, args.budget, counter)
+            stats[name]["seconds"] += time.perf_counter() - start
+            stats[name]["tokens"].append(sum(counter.count_message(message) for message in prompt))
+            stats[name]["broken"] += broken_pairs(prompt) > 0
+
+    for turn in range(args.turns):
+        messages.append({'role': 'user', 'content': f"Question {turn}: what is going on with topic {turn} today?"})
+        query_llm(messages)
+        if turn % args.tool_every == 0:
+            # Sometimes a remark before the tool calls, then one or two searches, then the LLM is queried again with the results
+            searches = 1 + (turn // args.tool_every) % 2
+            if turn % 3 == 0:
+                messages.append({'role': 'assistant', 'content': "Let me look that up, sir."})
+            for search in range(searches):
+                messages.append(tool_call(f"{turn}.{search}", f"topic {turn}"))
+                messages.append(tool_result(f"{turn}.{search}", f"result {turn} " * (args.result_chars // 8)))
+            query_llm(messages)
+        messages.append({'role': 'assistant', 'content': f"Topic {turn} is fine, sir."})
+
+    print(f"{args.turns} turns, a {args.result_chars}-character search result every {args.tool_every} turns, budget {args.budget} tokens, {len(stats['budget']['tokens'])} prompts")
+    for name, result in stats.items():
+        tokens = result["tokens"]
+        print(
+            f"{name:<8} prompt tokens: first {tokens[0]:>6}  last {tokens[-1]:>6}  max {max(tokens):>6}"
+            f"   prompts with a split tool pair {result['broken']:>3}   trimming {result['seconds'] / len(tokens) * 1000:.2f}ms/prompt"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=8192)
+    parser.add_argument("--result-chars", type=int, default=4000)
+    parser.add_argument("--tool-every", type=int, default=2)
+    main(parser.parse_args())
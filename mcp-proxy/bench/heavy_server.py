@@ -0,0 +1,31 @@
+"""
+Stand-in for an MCP server with expensive tools, run in its own process next to
+bench/stub_server.py. Its tools are named after --name, so several can run at
+once, and --startup-seconds delays the start like a server loading a model.
+"""
+import argparse
+import os
+import time
+
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP()
+
+def lookup(query: str, seconds: float = 0.5) -> str:
+    """Look something up with a synchronous library, blocking this server process"""
+    time.sleep(seconds)
+    return f"Found {query}"
+
+def crash() -> str:
+    """Make this server process exit, as if it crashed"""
+    os._exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--name", default="heavy")
+    parser.add_argument("--startup-seconds", type=float, default=0.0)
+    args = parser.parse_args()
+    time.sleep(args.startup_seconds)
+    mcp.add_tool(lookup, name=f"{args.name}_lookup")
+    mcp.add_tool(crash, name=f"{args.name}_crash")
+    mcp.run(transport="stdio")
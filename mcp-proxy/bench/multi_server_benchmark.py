@@ -0,0 +1,72 @@
+"""
+Connect the MCP proxy to several MCP servers and measure:
+- startup time with one and with --servers servers that each take
+  --startup-seconds to start (connected one after another, N servers would
+  take N times as long as one)
+- the latency of a fast tool (get_time on bench/stub_server.py) called in the
+  same turn as a tool that blocks or crashes its own server
+  (bench/heavy_server.py), while a third server is still starting
+
+Run from the mcp-proxy directory:
+    python -m bench.multi_server_benchmark --servers 4 --startup-seconds 1.0
+"""
+import argparse
+import asyncio
+import time
+
+from bench.tool_calls_benchmark import ScriptedLLM
+from mcp_flow import MCPClient
+
+async def measure_startup(num_servers: int, startup_seconds: float):
+    client = MCPClient(ScriptedLLM([]))
+    client.pool_size = 1
+    servers = {f"s{i}": f"bench/heavy_server.py --name s{i} --startup-seconds {startup_seconds}" for i in range(num_servers)}
+    start = time.perf_counter()
+    await client.connect_to_servers(servers)
+    elapsed = time.perf_counter() - start
+    try:
+        tools = await client.list_tools()
+        print(f"startup: {num_servers} servers taking {startup_seconds:.2f}s each connected in {elapsed:.2f}s, {len(tools)} tools routed")
+    finally:
+        await client.cleanup()
+
+async def timed_call(client: MCPClient, tool_name: str, tool_args: dict) -> tuple[float, str]:
+    start = time.perf_counter()
+    result = await client.call_tool_text(tool_name, tool_args)
+    return time.perf_counter() - start, result
+
+async def measure_isolation(seconds: float):
+    client = MCPClient(ScriptedLLM([]))
+    client.pool_size = 1
+    client.connect_timeout = 2.0
+    start = time.perf_counter()
+    await client.connect_to_servers({
+        "stub": "bench/stub_server.py",
+        "heavy": "bench/heavy_server.py --name heavy",
+        "late": "bench/heavy_server.py --name late --startup-seconds 30",
+    })
+    print(f"startup with a server that takes 30s: {time.perf_counter() - start:.2f}s (connect timeout {client.connect_timeout:g}s)")
+    try:
+        for label, slow_call in (("blocking", ("heavy_lookup", {'query': 'jarvis', 'seconds': seconds})), ("crashing", ("heavy_crash", {}))):
+            (fast_seconds, fast), (slow_seconds, slow) = await asyncio.gather(
+                timed_call(client, "get_time", {}),
+                timed_call(client, *slow_call),
+            )
+            print(f"{label} tool in the same turn: get_time answered {fast!r} in {fast_seconds * 1000:.1f}ms, {slow_call[0]} returned after {slow_seconds:.2f}s: {slow[:60]!r}")
+        _, late = await timed_call(client, "late_lookup", {'query': 'jarvis'})
+        print(f"tool of the server still starting: {late!r}")
+    finally:
+        await client.cleanup()
+
+async def main_async(args):
+    # One server first, for the time a single server takes including process and session setup
+    for num_servers in (1, args.servers):
+        await measure_startup(num_servers, args.startup_seconds)
+    await measure_isolation(args.seconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=4)
+    parser.add_argument("--startup-seconds", type=float, default=1.0)
+    parser.add_argument("--seconds", type=float, default=1.0, help="how long heavy_lookup blocks its server")
+    asyncio.run(main_async(parser.parse_args()))
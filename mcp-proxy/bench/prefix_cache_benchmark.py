@@ -0,0 +1,77 @@
+"""
+Measure how much of each prompt repeats the start of the previous one, so that
+a prompt-prefix cache (Ollama's KV cache, Anthropic's prompt caching) can skip
+it. A synthetic conversation (see bench/context_benchmark.py) is trimmed to
+--budget tokens either one turn at a time (trim step 1, which moves the start
+of the prompt every turn once the budget is reached) or --trim-step turns at a
+time, and for every LLM call the tokens after the shared prefix are counted.
+
+With --ollama MODEL the prompts are also sent to a local Ollama, and the
+prompt evaluation time it reports is added up, e.g.:
+    python -m bench.prefix_cache_benchmark --turns 40 --budget 2048 --ollama qwen2.5:1.5b
+
+Run from the mcp-proxy directory:
+    python -m bench.prefix_cache_benchmark --turns 50 --budget 8192 --trim-step 4
+"""
+import argparse
+import asyncio
+import json
+
+import ollama
+
+from bench.context_benchmark import tool_call, tool_result
+from LLMs.context import TokenCounter, fit_messages
+
+def conversation_prompts(args, trim_step: int, counter: TokenCounter) -> list[list[dict]]:
+    """The messages of every LLM call of the conversation, trimmed as the Ollama adapter would"""
+    prompts = []
+    messages = []
+    for turn in range(args.turns):
+        messages.append({'role': 'user', 'content': f"Question {turn}: what is going on with topic {turn} today?"})
+        prompts.append(list(fit_messages(messages, args.budget, counter, trim_step)))
+        if turn % args.tool_every == 0:
+            messages.append(tool_call(str(turn), f"topic {turn}"))
+            messages.append(tool_result(str(turn), f"result {turn} " * (args.result_chars // 8)))
+            prompts.append(list(fit_messages(messages, args.budget, counter, trim_step)))
+        messages.append({'role': 'assistant', 'content': f"Topic {turn} is fine, sir."})
+    return prompts
+
+def new_tokens(previous: list[dict], prompt: list[dict], counter: TokenCounter) -> int:
+    """Tokens of prompt after the messages it shares with the start of previous"""
+    shared = 0
+    while shared < min(len(previous), len(prompt)) and json.dumps(previous[shared]) == json.dumps(prompt[shared]):
+        shared += 1
+    return sum(counter.count_message(message) for message in prompt[shared:])
+
+async def ollama_prompt_eval(model: str, prompts: list[list[dict]]) -> tuple[float, int]:
+    client = ollama.AsyncClient()
+    seconds = 0.0
+    tokens = 0
+    for prompt in prompts:
+        response = await client.chat(model=model, messages=prompt, options={'num_predict': 1}, keep_alive="24h")
+        seconds += (response.prompt_eval_duration or 0) / 1e9
+        tokens += response.prompt_eval_count or 0
+    return seconds, tokens
+
+async def main_async(args):
+    counter = TokenCounter()
+    print(f"{args.turns} turns, budget {args.budget} tokens")
+    for trim_step in (1, args.trim_step):
+        prompts = conversation_prompts(args, trim_step, counter)
+        total = sum(sum(counter.count_message(message) for message in prompt) for prompt in prompts)
+        uncached = sum(new_tokens(previous, prompt, counter) for previous, prompt in zip([[]] + prompts, prompts))
+        line = f"trim step {trim_step}: {len(prompts)} prompts, {total:>7} prompt tokens, {uncached:>7} after the shared prefix ({uncached / total:.0%})"
+        if args.ollama:
+            seconds, evaluated = await ollama_prompt_eval(args.ollama, prompts)
+            line += f"   Ollama evaluated {evaluated} tokens in {seconds:.2f}s"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=8192)
+    parser.add_argument("--trim-step", type=int, default=4)
+    parser.add_argument("--result-chars", type=int, default=4000)
+    parser.add_argument("--tool-every", type=int, default=2)
+    parser.add_argument("--ollama", default=None, metavar="MODEL", help="also send the prompts to this Ollama model")
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,87 @@
+"""
+Check that the MCP proxy keeps serving /health and other queries while slow
+LLM generations are in progress. A fake LLM that takes --llm-seconds per call
+is run three ways: blocking the event loop (how the synchronous Ollama and
+Anthropic clients used to be called), as a synchronous adapter (run in the
+thread pool), and as an async adapter.
+
+Run from the mcp-proxy directory:
+    python -m bench.responsiveness_benchmark --queries 4 --llm-seconds 1.0
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import LLMs.ollama_llms
+
+class SlowLLM:
+    response_limit = 4000
+    context_len = 40000
+    llm_seconds = 1.0
+
+    def format_tool_call(self, tool_use_id, tool_name, tool_args):
+        return {'role': 'assistant', 'content': f'tool_use {tool_use_id} {tool_name} {tool_args}'}
+
+    def format_tool_result(self, tool_use_id, result):
+        return {'role': 'user', 'content': f'tool_result {tool_use_id} {result}'}
+
+class BlockingLLM(SlowLLM):
+    async def query_llm(self, messages: list, tools: list):
+        time.sleep(self.llm_seconds) # A synchronous client called straight from the event loop
+        return {'llm_response': 'Done, sir.', 'tool_calls': []}
+
+class SyncLLM(SlowLLM):
+    def query_llm(self, messages: list, tools: list):
+        time.sleep(self.llm_seconds)
+        return {'llm_response': 'Done, sir.', 'tool_calls': []}
+
+class AsyncLLM(SlowLLM):
+    async def query_llm(self, messages: list, tools: list):
+        await asyncio.sleep(self.llm_seconds)
+        return {'llm_response': 'Done, sir.', 'tool_calls': []}
+
+# main.py builds its client from OllamaAPI at import, swap in the fake before importing it
+LLMs.ollama_llms.OllamaAPI = AsyncLLM
+import main # noqa: E402
+
+async def measure(label: str, num_queries: int):
+    test_client = main.app.test_client()
+    health_latencies = []
+    done = asyncio.Event()
+
+    async def poll_health():
+        while not done.is_set():
+            start = time.perf_counter()
+            await test_client.get('/health')
+            health_latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.05)
+
+    async def query(i: int):
+        response = await test_client.post('/query', json={'query': f'Question {i}', 'history': []})
+        assert response.status_code == 200, await response.get_data()
+
+    poller = asyncio.create_task(poll_health())
+    start = time.perf_counter()
+    await asyncio.gather(*(query(i) for i in range(num_queries)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await poller
+    print(f"{label:<10} {num_queries} queries took {elapsed:5.2f}s   /health p50={statistics.median(health_latencies):7.1f}ms  max={max(health_latencies):7.1f}ms")
+
+async def main_async(num_queries: int, llm_seconds: float):
+    await main.client.connect_to_server("bench/stub_server.py")
+    try:
+        for label, llm in (("blocking", BlockingLLM()), ("sync", SyncLLM()), ("async", AsyncLLM())):
+            llm.llm_seconds = llm_seconds
+            main.client.llm = llm
+            await measure(label, num_queries)
+    finally:
+        await main.client.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=4)
+    parser.add_argument("--llm-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.queries, args.llm_seconds))
@@ -0,0 +1,44 @@
+"""
+Measure how the MCP proxy's throughput scales with the session pool size when
+tools block their server process (synchronous libraries, CPU-bound work).
+Each query makes one blocking_lookup call on bench/stub_server.py.
+
+Run from the mcp-proxy directory:
+    python -m bench.session_pool_benchmark --queries 8 --seconds 0.5 --pool-sizes 1,2,4
+"""
+import argparse
+import asyncio
+import time
+
+from bench.tool_calls_benchmark import ScriptedLLM
+from mcp_flow import MCPClient
+
+class LookupLLM(ScriptedLLM):
+    async def query_llm(self, messages: list, tools: list):
+        if not str(messages[-1]['content']).startswith('tool_result'):
+            return {'llm_response': '', 'tool_calls': [{'name': 'blocking_lookup', 'args': self.searches[0], 'tool_use_id': '0'}]}
+        return {'llm_response': 'Done, sir.', 'tool_calls': []}
+
+async def measure(pool_size: int, num_queries: int, seconds: float):
+    client = MCPClient(LookupLLM([{'query': 'jarvis', 'seconds': seconds}]))
+    client.pool_size = pool_size
+    await client.connect_to_server("bench/stub_server.py")
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(client.process_query(f"Look up thing {i}", []) for i in range(num_queries)))
+        elapsed = time.perf_counter() - start
+        print(f"pool size {pool_size}: {num_queries} queries in {elapsed:.2f}s ({num_queries / elapsed:.2f} queries/s)")
+    finally:
+        await client.cleanup()
+
+async def main_async(num_queries: int, seconds: float, pool_sizes: list[int]):
+    for pool_size in pool_sizes:
+        await measure(pool_size, num_queries, seconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=0.5, help="how long each lookup blocks its server")
+    parser.add_argument("--pool-sizes", type=lambda value: [int(size) for size in value.split(",")], default=[1, 2, 4])
+    args = parser.parse_args()
+    asyncio.run(main_async(args.queries, args.seconds, args.pool_sizes))
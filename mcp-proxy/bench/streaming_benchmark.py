@@ -0,0 +1,102 @@
+"""
+Compare time-to-first-token with total time for /query, as plain JSON and
+streamed as NDJSON. A scripted LLM generates --tokens tokens at --token-seconds
+each; with --search it first asks for a slow_search call, whose tool_call and
+tool_result events arrive before the answer's tokens.
+
+Run from the mcp-proxy directory:
+    python -m bench.streaming_benchmark --tokens 40 --token-seconds 0.05 --search 0.5
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import LLMs.ollama_llms
+
+class StreamingLLM:
+    response_limit = 4000
+    context_len = 40000
+    tokens = 40
+    token_seconds = 0.05
+    search_seconds = 0.0 # 0 answers straight away
+
+    def format_tool_call(self, tool_use_id, tool_name, tool_args):
+        return {'role': 'assistant', 'content': f'tool_use {tool_use_id} {tool_name} {tool_args}'}
+
+    def format_tool_result(self, tool_use_id, result):
+        return {'role': 'user', 'content': f'tool_result {tool_use_id} {result}'}
+
+    async def query_llm(self, messages: list, tools: list):
+        response = None
+        async for event in self.stream_llm(messages, tools):
+            response = event
+        return {'llm_response': response['llm_response'], 'tool_calls': response['tool_calls']}
+
+    async def stream_llm(self, messages: list, tools: list):
+        if self.search_seconds > 0 and not str(messages[-1]['content']).startswith('tool_result'):
+            await asyncio.sleep(self.token_seconds)
+            tool_calls = [{'name': 'slow_search', 'args': {'query': 'the news', 'seconds': self.search_seconds}, 'tool_use_id': '1'}]
+            yield {'type': 'response', 'llm_response': '', 'tool_calls': tool_calls}
+            return
+        text = ""
+        for i in range(self.tokens):
+            await asyncio.sleep(self.token_seconds)
+            token = "Certainly, sir. " if i == 0 else f"word{i} "
+            text += token
+            yield {'type': 'token', 'text': token}
+        yield {'type': 'response', 'llm_response': text.strip(), 'tool_calls': []}
+
+# main.py builds its client from OllamaAPI at import, swap in the fake before importing it
+LLMs.ollama_llms.OllamaAPI = StreamingLLM
+import main # noqa: E402
+
+async def measure_json(test_client) -> tuple[float, float]:
+    start = time.perf_counter()
+    response = await test_client.post('/query', json={'query': 'What is the news?', 'history': []})
+    assert response.status_code == 200, await response.get_data()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed # the first token arrives with the whole answer
+
+async def measure_stream(test_client) -> tuple[float, float]:
+    start = time.perf_counter()
+    first_token = None
+    buffer = b""
+    events = []
+    async with test_client.request('/query', method='POST', headers={'Content-Type': 'application/json'}) as connection:
+        await connection.send(json.dumps({'query': 'What is the news?', 'history': [], 'stream': True}).encode())
+        await connection.send_complete()
+        while not events or events[-1] not in ('final', 'error'):
+            buffer += await connection.receive()
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                event = json.loads(line)
+                events.append(event['type'])
+                if event['type'] == 'token' and first_token is None:
+                    first_token = time.perf_counter() - start
+    assert events[-1] == 'final', events
+    return first_token, time.perf_counter() - start
+
+async def main_async(tokens: int, token_seconds: float, search_seconds: float, runs: int):
+    main.client.llm.tokens = tokens
+    main.client.llm.token_seconds = token_seconds
+    main.client.llm.search_seconds = search_seconds
+    await main.client.connect_to_server("bench/stub_server.py")
+    try:
+        test_client = main.app.test_client()
+        for label, measure in (("json", measure_json), ("ndjson", measure_stream)):
+            results = [await measure(test_client) for _ in range(runs)]
+            first_token = sum(result[0] for result in results) / runs
+            total = sum(result[1] for result in results) / runs
+            print(f"{label:<7} first token {first_token * 1000:7.1f}ms   complete {total * 1000:7.1f}ms")
+    finally:
+        await main.client.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-seconds", type=float, default=0.05)
+    parser.add_argument("--search", type=float, default=0.0, help="seconds of a slow_search call before the answer, 0 for none")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.tokens, args.token_seconds, args.search, args.runs))
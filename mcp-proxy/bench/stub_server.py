@@ -0,0 +1,47 @@
+"""
+Stand-in MCP server with slow tools, so the client can be measured without
+Ollama, API keys or network access. Run by the benchmarks over stdio.
+"""
+import asyncio
+import time
+
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP()
+
+@mcp.tool()
+async def slow_search(query: str, seconds: float = 1.0) -> str:
+    """Pretend to search the web for query, taking the given number of seconds"""
+    await asyncio.sleep(seconds)
+    return f"Results for {query}"
+
+@mcp.tool(meta={"jarvis/cache_ttl": 60})
+async def cached_search(query: str, seconds: float = 0.5) -> str:
+    """Like slow_search, but declared cacheable for 60 seconds"""
+    await asyncio.sleep(seconds)
+    return f"Results for {query}"
+
+@mcp.tool()
+def blocking_lookup(query: str, seconds: float = 0.5) -> str:
+    """Pretend to look something up with a synchronous library, blocking this server process"""
+    time.sleep(seconds)
+    return f"Found {query}"
+
+@mcp.tool()
+async def wait_for_cancel(marker_path: str, seconds: float = 30.0) -> str:
+    """Wait for seconds, writing marker_path if the call is cancelled (e.g. by notifications/cancelled) first"""
+    try:
+        await asyncio.sleep(seconds)
+    except asyncio.CancelledError:
+        with open(marker_path, "w") as f:
+            f.write("cancelled")
+        raise
+    return "Not cancelled"
+
+@mcp.tool()
+async def get_time() -> str:
+    """Get the current time"""
+    return "12:00"
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
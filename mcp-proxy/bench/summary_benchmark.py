@@ -0,0 +1,94 @@
+"""
+Run synthetic --turns-turn conversations through MCPClient, with and without
+background summarization, and report the size of the prompt the LLM gets per
+turn and the query latency. A scripted LLM answers after --llm-seconds and a
+fake summary model (no Ollama needed) takes --summary-seconds, so the summary
+written after one turn is in place by the time the next query arrives.
+
+Run from the mcp-proxy directory:
+    python -m bench.summary_benchmark --turns 50 --llm-seconds 0.05 --summary-seconds 0.2 --think-seconds 0.3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+from LLMs.context import TokenCounter
+from mcp_flow import MCPClient
+
+class ChattyLLM:
+    """Answers every query with a few sentences and records how many tokens it was sent"""
+
+    response_limit = 4000
+    context_len = 40000
+
+    def __init__(self, llm_seconds: float):
+        self.llm_seconds = llm_seconds
+        self.counter = TokenCounter()
+        self.prompt_tokens: list[int] = []
+
+    async def query_llm(self, messages: list, tools: list):
+        self.prompt_tokens.append(sum(self.counter.count_message(message) for message in messages))
+        await asyncio.sleep(self.llm_seconds)
+        question = messages[-1]['content']
+        answer = f"Regarding '{question}', sir: the figures you asked about are in order and nothing needs your attention. " * 3
+        return {'llm_response': answer.strip(), 'tool_calls': []}
+
+    def format_tool_call(self, tool_use_id, tool_name, tool_args):
+        return {'role': 'assistant', 'content': f'tool_use {tool_use_id} {tool_name} {tool_args}'}
+
+    def format_tool_result(self, tool_use_id, result):
+        return {'role': 'user', 'content': f'tool_result {tool_use_id} {result}'}
+
+class FakeSummaryModel:
+    """Stands in for the Ollama client of the summarizer: a summary of about 120 words after a delay"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.calls = 0
+
+    async def chat(self, model: str, messages: list, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        return SimpleNamespace(message=SimpleNamespace(content=" ".join(["summary"] * 120)))
+
+async def converse(client: MCPClient, turns: int, think_seconds: float) -> list[float]:
+    history = []
+    latencies = []
+    for turn in range(turns):
+        start = time.perf_counter()
+        response = await client.process_query(f"Question {turn}: how are the accounts for project {turn} looking?", history)
+        latencies.append(time.perf_counter() - start)
+        history = response['history']
+        # The user reads or listens to the answer before asking the next question
+        await asyncio.sleep(think_seconds)
+    return latencies
+
+async def main_async(args):
+    for label, enabled in (("raw", False), ("summary", True)):
+        llm = ChattyLLM(args.llm_seconds)
+        client = MCPClient(llm)
+        summary_model = FakeSummaryModel(args.summary_seconds)
+        client.summarizer.client = summary_model
+        if not enabled:
+            client.summarizer.model = ""
+        await client.connect_to_server("bench/stub_server.py")
+        try:
+            latencies = await converse(client, args.turns, args.think_seconds)
+        finally:
+            await client.cleanup()
+        tokens = llm.prompt_tokens
+        checkpoints = "  ".join(f"turn {turn}: {tokens[turn - 1]:>5}" for turn in (1, 10, 25, args.turns) if turn <= len(tokens))
+        print(
+            f"{label:<8} prompt tokens  {checkpoints}   query p50 {statistics.median(latencies) * 1000:6.1f}ms"
+            f"  max {max(latencies) * 1000:6.1f}ms   summaries written {summary_model.calls}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--llm-seconds", type=float, default=0.05)
+    parser.add_argument("--summary-seconds", type=float, default=0.2)
+    parser.add_argument("--think-seconds", type=float, default=0.3, help="pause between a response and the next query")
+    asyncio.run(main_async(parser.parse_args()))
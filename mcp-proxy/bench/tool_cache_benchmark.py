@@ -0,0 +1,79 @@
+"""
+Replay a repetitive mix of searches ("weather today", "Lakers score", ...)
+through the tool result cache. A scripted LLM asks for one cached_search per
+query (bench/stub_server.py declares it cacheable), which takes --seconds when
+it misses. The client is restarted halfway, so with --cache-file the second
+half also shows the cache surviving a restart.
+
+Run from the mcp-proxy directory:
+    python -m bench.tool_cache_benchmark --queries 40 --distinct 8 --seconds 0.5 --cache-file /tmp/jarvis_tool_cache.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from mcp_flow import MCPClient
+
+class SearchingLLM:
+    """Asks for the search named in the query, then answers"""
+
+    response_limit = 4000
+    context_len = 40000
+    seconds = 0.5
+
+    async def query_llm(self, messages: list, tools: list):
+        if messages[-1]['role'] == 'user' and not str(messages[-1]['content']).startswith('tool_result'):
+            args = {'query': messages[-1]['content'], 'seconds': self.seconds}
+            return {'llm_response': '', 'tool_calls': [{'name': 'cached_search', 'args': args, 'tool_use_id': '1'}]}
+        return {'llm_response': 'Done, sir.', 'tool_calls': []}
+
+    def format_tool_call(self, tool_use_id, tool_name, tool_args):
+        return {'role': 'assistant', 'content': f'tool_use {tool_use_id} {tool_name} {tool_args}'}
+
+    def format_tool_result(self, tool_use_id, result):
+        return {'role': 'user', 'content': f'tool_result {tool_use_id} {result}'}
+
+async def run_half(label: str, queries: list[str], seconds: float) -> None:
+    llm = SearchingLLM()
+    llm.seconds = seconds
+    client = MCPClient(llm)
+    await client.connect_to_server("bench/stub_server.py")
+    try:
+        start = time.perf_counter()
+        tools_time = 0.0
+        for query in queries:
+            response = await client.process_query(query, [])
+            tools_time += response['timings']['tools']
+        elapsed = time.perf_counter() - start
+        stats = client.tool_cache.stats()['tools'].get('cached_search', {})
+        print(f"{label:<7} {len(queries)} queries in {elapsed:5.2f}s (tools {tools_time:5.2f}s)  hits={stats.get('hits', 0)} misses={stats.get('misses', 0)} saved={stats.get('seconds_saved', 0):.2f}s")
+    finally:
+        await client.cleanup()
+
+async def main_async(args):
+    if args.cache_file:
+        os.environ["JARVIS_TOOL_CACHE_FILE"] = args.cache_file
+        if os.path.exists(args.cache_file):
+            os.remove(args.cache_file)
+    random.seed(args.seed)
+    distinct = ["weather today", "Lakers score", "news headlines", "stock market", "traffic downtown", "movie times", "bitcoin price", "sunset time"]
+    distinct = [distinct[i % len(distinct)] + ("" if i < len(distinct) else f" {i}") for i in range(args.distinct)]
+    # Popular searches come up far more often than the rest
+    queries = random.choices(distinct, weights=[1 / (rank + 1) for rank in range(len(distinct))], k=args.queries)
+    # Differently spaced repeats hit the same entry
+    queries = [f"  {query} " if i % 3 == 0 else query for i, query in enumerate(queries)]
+    half = len(queries) // 2
+    await run_half("first", queries[:half], args.seconds)
+    await run_half("restart" if args.cache_file else "second", queries[half:], args.seconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--distinct", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=0.5, help="duration of a search that misses the cache")
+    parser.add_argument("--cache-file", default=None, help="persist the cache here, so the second half starts warm")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
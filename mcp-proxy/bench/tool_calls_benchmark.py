@@ -0,0 +1,60 @@
+"""
+Time one agent turn in which the LLM asks for several searches at once, with
+tool calls run one after another (concurrency 1) versus concurrently.
+A scripted LLM stands in for Ollama and bench/stub_server.py for the MCP server.
+
+Run from the mcp-proxy directory:
+    python -m bench.tool_calls_benchmark --searches 3 --seconds 1.0
+"""
+import argparse
+import asyncio
+import time
+
+from mcp_flow import MCPClient
+
+class ScriptedLLM:
+    """Asks for the given searches on the first call and answers on the next one"""
+
+    response_limit = 4000
+    context_len = 40000
+
+    def __init__(self, searches: list[dict]):
+        self.searches = searches
+        self.result_order: list[str] = [] # tool_use_ids of the results the LLM was given, in order
+
+    async def query_llm(self, messages: list, tools: list):
+        if messages[-1]['role'] == 'user' and isinstance(messages[-1]['content'], str) and not messages[-1]['content'].startswith('tool_result'):
+            tool_calls = [{'name': 'slow_search', 'args': args, 'tool_use_id': str(i)} for i, args in enumerate(self.searches)]
+            return {'llm_response': '', 'tool_calls': tool_calls}
+        self.result_order = [message['content'].split()[1] for message in messages if str(message['content']).startswith('tool_result')]
+        return {'llm_response': 'Done, sir.', 'tool_calls': []}
+
+    def format_tool_call(self, tool_use_id, tool_name, tool_args):
+        return {'role': 'assistant', 'content': f'tool_use {tool_use_id} {tool_name} {tool_args}'}
+
+    def format_tool_result(self, tool_use_id, result):
+        return {'role': 'user', 'content': f'tool_result {tool_use_id} {result}'}
+
+async def main_async(num_searches: int, seconds: float):
+    # Slightly different durations, so the concurrent turn should take about as long as the slowest
+    searches = [{'query': f'topic {i}', 'seconds': seconds * (1 + i / 10)} for i in range(num_searches)]
+    llm = ScriptedLLM(searches)
+    client = MCPClient(llm)
+    await client.connect_to_server("bench/stub_server.py")
+    try:
+        for concurrency in (1, num_searches):
+            client.tool_concurrency = concurrency
+            start = time.perf_counter()
+            response = await client.process_query("Search for a few things", [])
+            elapsed = time.perf_counter() - start
+            in_order = llm.result_order == [str(i) for i in range(num_searches)]
+            print(f"concurrency={concurrency}: turn took {elapsed:.2f}s (tools {response['timings']['tools']:.2f}s, slowest search {searches[-1]['seconds']:.2f}s), results in call order: {in_order}")
+    finally:
+        await client.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.searches, args.seconds))
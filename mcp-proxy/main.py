@@ -1,6 +1,8 @@
 import sys
+import json
 import signal
 import asyncio
+from contextlib import aclosing
 from dotenv import load_dotenv
 from quart import Quart, request, jsonify
 from quart_cors import cors
@@ -38,15 +40,63 @@ signal.signal(signal.SIGINT, signal_handler)
 
 @app.route('/health', methods=['GET'])
 async def health_check():
-    """Health check endpoint"""
-    return jsonify({'status': 'healthy'}), 200
+    """Health check endpoint, unhealthy when no MCP server is connected"""
+    servers = [server.snapshot() for server in client.servers.values()]
+    if not any(server['connected'] for server in servers):
+        return jsonify({'status': 'unhealthy', 'mcp_servers': servers}), 503
+    return jsonify({'status': 'healthy', 'mcp_servers': servers}), 200
+
+def valid_budget(key: str, value) -> bool:
+    """A positive whole number of LLM or tool calls, or a positive number of seconds (JSON true and false are not numbers)"""
+    if key not in client.budget or isinstance(value, bool):
+        return False
+    number_types = (int, float) if key == 'seconds' else int
+    return isinstance(value, number_types) and value > 0
+
+def format_event(event: dict, sse: bool) -> bytes:
+    if sse:
+        return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode('utf-8')
+    return (json.dumps(event) + "\n").encode('utf-8')
+
+def stream_events(query: str, history: list, sse: bool, budget: dict):
+    """Response body of a streaming /query: the events of process_query_events, then an "error" event if it fails"""
+    async def body():
+        try:
+            async with aclosing(client.process_query_events(query, history, budget)) as events:
+                async for event in events:
+                    if event['type'] == 'final':
+                        event['timings'] = {name: round(seconds * 1000, 1) for name, seconds in event['timings'].items()}
+                    yield format_event(event, sse)
+        except Exception as e:
+            print(e)
+            yield format_event({'type': 'error', 'error': str(e)}, sse)
+    return body()
+
+@app.route('/stats', methods=['GET'])
+async def stats():
+    """
+    Tool result cache counters (hits, misses and seconds of tool calls saved, per tool), the LLM's
+    prompt usage (prompt tokens evaluated, their evaluation time and tokens read from the prompt cache)
+    and the number of queries cut short by each budget of the agent loop
+    """
+    return jsonify({'tool_cache': client.tool_cache.stats(), 'llm': dict(client.llm_usage), 'budgets_exhausted': dict(client.budgets_exhausted)}), 200
 
 @app.route('/query', methods=['POST'])
 async def query_llm():
-    """Endpoint to query the LLM"""
+    """
+    Endpoint to query the LLM. With "stream": true in the body (or an Accept header of
+    application/x-ndjson or text/event-stream) the answer is streamed as it is generated:
+    newline-delimited JSON events, or Server-Sent Events for text/event-stream. See
+    MCPClient.process_query_events for the events; timings of the "final" event are in milliseconds.
+    "budget": {"llm_calls": ..., "tool_calls": ..., "seconds": ...} in the body overrides the agent loop's limits.
+    """
     req_body = await request.get_json()
     query = req_body.get('query')
     history = req_body.get('history', [])
+    accept = request.headers.get('Accept', '')
+    sse = 'text/event-stream' in accept
+    budget = req_body.get('budget') or {}
+    stream = req_body.get('stream') is True or sse or 'application/x-ndjson' in accept
 
     if not isinstance(history, list):
         return jsonify({'error': 'Invalid history format'}), 400
@@ -56,11 +106,18 @@ async def query_llm():
             return jsonify({'error': 'Invalid history item format'}), 400
         if item['role'] not in ['user', 'assistant', 'system']:
             return jsonify({'error': 'Invalid role in history item'}), 400
+    if not isinstance(budget, dict) or not all(valid_budget(key, value) for key, value in budget.items()):
+        return jsonify({'error': 'Invalid budget'}), 400
     try:
         if not query or not isinstance(query, str) or len(query) == 0 or len(query) > 1000:
             return jsonify({'error': 'Invalid query'}), 400
-        response = await client.process_query(query, history)
-        return jsonify({'response': response}), 200
+        if stream:
+            content_type = 'text/event-stream' if sse else 'application/x-ndjson'
+            return stream_events(query, history, sse, budget), 200, {'Content-Type': content_type, 'Cache-Control': 'no-cache'}
+        response = await client.process_query(query, history, budget)
+        timings = response.pop('timings')
+        server_timing = ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items())
+        return jsonify({'response': response}), 200, {'Server-Timing': server_timing}
     except Exception as e:
         print(e)
         return jsonify({'error': str(e)}), 500
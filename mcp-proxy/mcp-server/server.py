@@ -1,6 +1,6 @@
 from typing import Any
 from dotenv import load_dotenv
-import requests
+import httpx
 import os
 import sys
 import signal
@@ -84,7 +84,7 @@ def safe_join(base_dir: str, user_input_path: str) -> str:
     return full_path
 
 
-def brave_search(query: str, count: int = 20):
+async def brave_search(query: str, count: int = 20):
     url = "https://api.search.brave.com/res/v1/web/search"
     headers = {
         "Accept": "application/json",
@@ -96,11 +96,15 @@ def brave_search(query: str, count: int = 20):
         "search_lang": "en",
 
     }
-    response = requests.get(url, headers=headers, params=params)
+    # Async so a cancelled tool call aborts the search instead of blocking the server
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url, headers=headers, params=params)
+    response.raise_for_status()
     clean_response = cleanse_brave_search(response.json())
     return clean_response
 
-@mcp.tool()
+# Search results stay current for a few minutes, so the MCP client may reuse them (see mcp-proxy/tool_cache.py)
+@mcp.tool(meta={"jarvis/cache_ttl": 300})
 async def search_the_internet(query: str) -> str:
     """Search the internet for information with a given query. Only use if you don't know the answer
     
@@ -112,12 +116,13 @@ async def search_the_internet(query: str) -> str:
     """
     try:
         search_results = None
-        search_results = brave_search(query)
+        search_results = await brave_search(query)
         return search_results
     except Exception as e:
         error = f"An error occurred: {str(e)}"
         logging.debug(f"An error occurred: {str(e)}")
-        return error
+        # Raised rather than returned, so the result is marked as an error and not cached by the client
+        raise RuntimeError(error)
 
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
@@ -1,107 +1,346 @@
+import asyncio
+import functools
+from collections import defaultdict
+import inspect
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
 from typing import Optional
-from contextlib import AsyncExitStack
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp import types
 
 import utils
+from mcp_servers import MCPServer
+from summarizer import Summarizer
+from tool_cache import CACHE_TTL_META_KEY, ToolResultCache, cache_key
+
+# Added to the last message of a query's last LLM call, see process_query_events
+FINAL_ANSWER_PROMPT = "No more tools can be called for this query. Answer the user now with the information you already have, and say so if it is incomplete."
+BUDGET_EXHAUSTED_RESPONSE = "I could not complete that request in time, sir."
+
+def with_final_answer_prompt(messages: list[dict]) -> list[dict]:
+    """
+    messages with FINAL_ANSWER_PROMPT added as a text block at the end of the last one (the query or a tool result).
+    A system message would be moved ahead of the conversation by Ollama's template and by Anthropic's system
+    blocks, so the prompt would no longer start with the cached prefix of the previous calls.
+    """
+    last = messages[-1]
+    content = last['content']
+    if isinstance(content, list):
+        content = content + [{'type': 'text', 'text': FINAL_ANSWER_PROMPT}]
+    else:
+        content = f"{content}\n\n{FINAL_ANSWER_PROMPT}"
+    return messages[:-1] + [{**last, 'content': content}]
 
 class MCPClient:
     def __init__(self, llm):
-        # Initialize session and client objects
-        self.session: Optional[ClientSession] = None
-        self.exit_stack = AsyncExitStack() # Handles closing of async resources
+        # MCP servers, each with its own session pool
+        self.servers: dict[str, MCPServer] = {}
+        self.connect_timeout = float(os.getenv("JARVIS_MCP_CONNECT_TIMEOUT", "10.0")) # seconds startup waits for servers
+        self.list_timeout = float(os.getenv("JARVIS_MCP_LIST_TIMEOUT", "5.0")) # seconds a server may take to list its tools
+        self.pool_size = int(os.getenv("JARVIS_MCP_POOL_SIZE", "2")) # MCP server connections (processes, for stdio)
+        self.session_concurrency = int(os.getenv("JARVIS_MCP_SESSION_CONCURRENCY", "4")) # requests in flight per connection
+        self.health_interval = float(os.getenv("JARVIS_MCP_HEALTH_INTERVAL", "15.0")) # seconds between pings of idle connections
         self.llm = llm
+        self.tools: Optional[list[types.Tool]] = None # Cached tool list of all servers, see list_tools
+        self.tool_routes: dict[str, MCPServer] = {} # tool name -> server that has it
+        self.tools_generation = 0 # Bumped whenever the cached tool list is invalidated
+        # Adapters with a synchronous query_llm run here, so a slow generation never blocks the event loop
+        self.llm_executor = ThreadPoolExecutor(max_workers=int(os.getenv("JARVIS_LLM_THREADS", "4")), thread_name_prefix="llm")
+        # Tool calls of one LLM turn run concurrently, at most tool_concurrency at a time
+        self.tool_concurrency = int(os.getenv("JARVIS_TOOL_CONCURRENCY", "4"))
+        self.tool_timeout = float(os.getenv("JARVIS_TOOL_TIMEOUT", "30.0")) # seconds
+        self.tool_timeouts = utils.parse_key_values(os.getenv("JARVIS_TOOL_TIMEOUTS", ""), float) # per tool, e.g. "brave_search=10,get_weather=5"
+        # Results of tools the server declares cacheable (see cache_ttl) are reused until their TTL runs out
+        self.tool_cache = ToolResultCache(int(os.getenv("JARVIS_TOOL_CACHE_BYTES", str(8 * 1024 * 1024))), os.getenv("JARVIS_TOOL_CACHE_FILE"))
+        self.tool_cache_ttls = utils.parse_key_values(os.getenv("JARVIS_TOOL_CACHE_TTLS", ""), float) # per tool, overrides the server's
+        self.summarizer = Summarizer() # Rolling summaries of long conversations, see summarizer.py
+        self.llm_usage = defaultdict(float) # prompt tokens evaluated and read from cache, summed over LLM calls
+        # Per query limits of the agent loop, see process_query_events. A request may lower or raise them
+        self.budget = {
+            'llm_calls': int(os.getenv("JARVIS_MAX_LLM_CALLS", "8")),
+            'tool_calls': int(os.getenv("JARVIS_MAX_TOOL_CALLS", "16")),
+            'seconds': float(os.getenv("JARVIS_QUERY_DEADLINE", "60.0")),
+        }
+        self.budgets_exhausted = defaultdict(int) # queries cut short, per budget that ran out
     # methods will go here
     async def connect_to_server(self, server_script_path: str):
-        """Connect to an MCP server
+        """Connect to the MCP servers listed in JARVIS_MCP_SERVERS, or else to a single server
         
         Args:
-            server_script_path: Path to the server script (.py or .js)
+            server_script_path: Path to the server script (.py or .js), started once per session.
+                Ignored when JARVIS_MCP_SERVER_URL points at a server using the streamable-HTTP transport
         """
-        is_python = server_script_path.endswith('.py')
-        is_js = server_script_path.endswith('.js')
-        if not (is_python or is_js):
-            raise ValueError("Server script must be a .py or .js file")
-        
-        command = "python" if is_python else "node"
-        server_params = StdioServerParameters(
-            command=command,
-            args=[server_script_path],
-            env=None
-        )
+        servers = utils.parse_key_values(os.getenv("JARVIS_MCP_SERVERS", ""))
+        if not servers:
+            servers = {"default": os.getenv("JARVIS_MCP_SERVER_URL") or server_script_path}
+        await self.connect_to_servers(servers)
 
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+    async def connect_to_servers(self, servers: dict[str, str]):
+        """
+        Connect to several MCP servers at once, each with a pool of JARVIS_MCP_POOL_SIZE sessions.
+        Startup waits at most JARVIS_MCP_CONNECT_TIMEOUT seconds; servers that are not up by then keep
+        connecting in the background and their tools are added once they are.
 
-        await self.session.initialize()
+        Args:
+            servers: name -> server script (with optional arguments) or streamable-HTTP URL.
+                When two servers have a tool of the same name, the one listed first gets the calls
+        """
+        # Built before anything is closed, so a bad target leaves the current servers in place
+        new_servers = {
+            name: MCPServer(name, target, self.pool_size, self.session_concurrency, self.health_interval, on_tools_changed=self.invalidate_tools)
+            for name, target in servers.items()
+        }
+        await asyncio.gather(*(server.close() for server in self.servers.values()))
+        self.servers = new_servers
+        self.invalidate_tools()
+
+        connecting = [server.start() for server in self.servers.values()]
+        await asyncio.wait(connecting, timeout=self.connect_timeout)
+        for server in self.servers.values():
+            if server.pool is None:
+                print(f"MCP server {server.name} is not connected yet, its tools will be added once it is")
+
+        await asyncio.to_thread(self.tool_cache.load)
 
         # List available tools
-        response = await self.session.list_tools()
-        tools = response.tools
-        print("\nConnected to server with tools:", [tool.name for tool in tools])
+        tools = await self.list_tools()
+        print("\nConnected to servers with tools:", {name: [tool.name for tool in tools if self.tool_routes.get(tool.name) is server] for name, server in self.servers.items()})
+
+    def invalidate_tools(self):
+        self.tools = None
+        self.tools_generation += 1
+
+    async def list_tools(self) -> list[types.Tool]:
+        """
+        The tools of all servers, merged and cached until one of them changes (tools/list_changed, reconnect).
+        Servers are asked concurrently; one that does not answer within JARVIS_MCP_LIST_TIMEOUT seconds
+        contributes the tools it listed before. The same list object is returned while it is cached,
+        so LLM adapters can memoize their converted schemas.
+        """
+        if self.tools is None:
+            generation = self.tools_generation
+            servers = list(self.servers.values())
+            server_tools = await asyncio.gather(*(server.list_tools(self.list_timeout) for server in servers))
+            tools = []
+            routes = {}
+            for server, listed in zip(servers, server_tools):
+                for tool in listed:
+                    if tool.name in routes:
+                        print(f"Tool {tool.name} of MCP server {server.name} is hidden by the one of {routes[tool.name].name}")
+                        continue
+                    routes[tool.name] = server
+                    tools.append(tool)
+            self.tool_routes = routes
+            if generation != self.tools_generation:
+                # Invalidated while fetching, this list may already be stale
+                return tools
+            self.tools = tools
+        return self.tools
+
+    async def call_tool(self, tool_name: str, tool_args: dict) -> types.CallToolResult:
+        """Call a tool on the server that has it"""
+        server = self.tool_routes.get(tool_name)
+        if server is None:
+            # Possibly a tool of a server that connected since the tools were listed
+            await self.list_tools()
+            server = self.tool_routes.get(tool_name)
+        if server is None:
+            return types.CallToolResult(content=[types.TextContent(type="text", text=f"Error: there is no tool named {tool_name}")], isError=True)
+        return await server.call_tool(tool_name, tool_args)
+
+    async def cache_ttl(self, tool_name: str) -> float:
+        """Seconds a result of the tool may be reused: JARVIS_TOOL_CACHE_TTLS, else the server's declaration, else 0"""
+        if tool_name in self.tool_cache_ttls:
+            return self.tool_cache_ttls[tool_name]
+        for tool in await self.list_tools():
+            if tool.name == tool_name and tool.meta:
+                return float(tool.meta.get(CACHE_TTL_META_KEY, 0))
+        return 0.0
+
+    async def call_tool_text(self, tool_name: str, tool_args: dict, deadline: Optional[float] = None) -> str:
+        """
+        Call a tool within its timeout and return its text result. A timeout or failure is reported to the LLM as the result.
+        The timeout is shortened to end at deadline (a time.perf_counter() value) if that comes first.
+        Results of cacheable tools are answered from the tool cache while they are fresh.
+        """
+        ttl = await self.cache_ttl(tool_name)
+        if ttl > 0:
+            key = cache_key(tool_name, tool_args)
+            cached = self.tool_cache.get(tool_name, key)
+            if cached is not None:
+                print(f"Tool {tool_name} answered from cache")
+                return cached
+
+        timeout = self.tool_timeouts.get(tool_name, self.tool_timeout)
+        start = time.perf_counter()
+        if deadline is not None:
+            timeout = max(0.0, min(timeout, deadline - start))
+        try:
+            result = await asyncio.wait_for(self.call_tool(tool_name, tool_args), timeout)
+        except asyncio.TimeoutError:
+            print(f"Tool {tool_name} timed out after {timeout}s")
+            return f"Error: the {tool_name} tool did not respond within {timeout:g} seconds"
+        except Exception as e:
+            # e.g. its server crashed; the LLM is told, and the other tool calls of the turn go on
+            print(f"Tool {tool_name} failed: {e}")
+            return f"Error: the {tool_name} tool failed: {str(e) or type(e).__name__}"
+        print(f"result: {result}")
+        text = result.content[0].text if result.content else ""
+        if ttl > 0 and not result.isError:
+            self.tool_cache.put(tool_name, key, text, ttl, time.perf_counter() - start)
+        return text
+
+    async def iter_tool_calls(self, tool_calls: list[dict], deadline: Optional[float] = None):
+        """Run one turn's tool calls concurrently and yield (index, text result) as each one finishes"""
+        semaphore = asyncio.Semaphore(self.tool_concurrency)
 
-    async def process_query(self, query: str, messages: list[dict]) -> dict:
-        """Process a query"""
+        async def run(index: int, tool_call: dict) -> tuple[int, str]:
+            async with semaphore:
+                return index, await self.call_tool_text(tool_call['name'], tool_call['args'], deadline)
+
+        tasks = [asyncio.ensure_future(run(index, tool_call)) for index, tool_call in enumerate(tool_calls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # If one call failed or the request was cancelled, stop the others too
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def query_llm(self, messages: list, tools: list) -> dict:
+        """Query the LLM without blocking the event loop, whether the adapter is async or not"""
+        if inspect.iscoroutinefunction(self.llm.query_llm):
+            return await self.llm.query_llm(messages=messages, tools=tools)
+        # A thread cannot be interrupted, so a cancelled request only stops waiting for the generation
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.llm_executor, functools.partial(self.llm.query_llm, messages=messages, tools=tools))
+
+    async def stream_llm(self, messages: list, tools: list):
+        """Yield the LLM's answer as token events, then a response event. Adapters without stream_llm yield one token"""
+        if hasattr(self.llm, 'stream_llm'):
+            async with aclosing(self.llm.stream_llm(messages=messages, tools=tools)) as events:
+                async for event in events:
+                    yield event
+            return
+        response = await self.query_llm(messages=messages, tools=tools)
+        if response['llm_response']:
+            yield {'type': 'token', 'text': response['llm_response']}
+        yield {'type': 'response', **response}
+
+    def record_usage(self, usage: dict, timings: dict):
+        """Add up the prompt usage an adapter reported. Prompt evaluation time is also reported as 'prefill'"""
+        self.llm_usage['calls'] += 1
+        for name, value in usage.items():
+            self.llm_usage[name] += value
+        if 'prompt_eval_seconds' in usage:
+            timings['prefill'] = timings.get('prefill', 0.0) + usage['prompt_eval_seconds']
+
+    async def process_query_events(self, query: str, messages: list[dict], budget: Optional[dict] = None):
+        """
+        Process a query, yielding events as it progresses:
+            {'type': 'token', 'text': ...}                                  part of an LLM answer
+            {'type': 'tool_call', 'name': ..., 'args': ..., 'tool_use_id': ...}  a tool call is starting
+            {'type': 'tool_result', 'name': ..., 'tool_use_id': ..., 'result': ...}  as each call finishes
+            {'type': 'final', 'response': {'query', 'history', 'LLM_response', 'budget_exhausted'}, 'timings': {...}}
+        Tokens of every LLM call are streamed, including any text before a tool call; LLM_response is the last answer.
+
+        The agent loop is limited to budget['llm_calls'] LLM calls, budget['tool_calls'] tool calls and budget['seconds']
+        (tool calls are cut off at the deadline, LLM calls are not). budget overrides self.budget per query. When a limit
+        is reached, the last LLM call is asked to answer with the tool results so far, and budget_exhausted names the limit.
+        The last call allowed by budget['llm_calls'] is asked the same; it only counts as exhausted if the LLM still asks for tools.
+        """
+        budget = {**self.budget, **(budget or {})}
 
         if messages is None:
             messages = []
-        messages.append({
+        query_message = {
                 "role": "user",
                 "content": query
-        })
-        history = messages.copy() # Create a copy of messages to send back to client (without tool results)
-        # List available tools for the LLMeturn
-        available_tools = (await self.session.list_tools()).tools
-
-        # Initial LLM call
-        response = self.llm.query_llm(
-            messages=messages,
-            tools=available_tools,
-        )
-
-        llm_response = response['llm_response']
-
-        if (llm_response):
-            temp = {
-                'role': 'assistant',
-                'content': llm_response
-            }
-            messages.append(temp)
-            history.append(temp)
-
-        tool_calls = response['tool_calls']
-        num_tool_calls_left = len(tool_calls)
-
-        while (num_tool_calls_left > 0):
-            for tool_call in tool_calls:
-                tool_name = tool_call['name']
-                tool_args = tool_call['args']
-                tool_use_id = tool_call['tool_use_id']
-
-                result = await self.session.call_tool(tool_name, tool_args)
-                
-                tool_call = self.llm.format_tool_call(tool_use_id, tool_name, tool_args)
-                
-                print(f"result: {result}")
-
-                tool_result = result.content[0].text if result.content else ""
-
-                tool_result = self.llm.format_tool_result(tool_use_id, utils.cap_start(tool_result, self.llm.response_limit))
-
-                messages.extend([tool_call, tool_result])
-                history.append({
-                'role': 'user',
-                'content': f'Tool called: {tool_name} with arguments: {tool_args}'
-                })
-                num_tool_calls_left -= 1
-
-            response = self.llm.query_llm(
-                messages=messages,
-                tools=available_tools,
-            )
+        }
+        history = messages + [query_message] # Sent back to the client (without tool results)
+        # Older turns that were already summarized are sent as their summary
+        messages = self.summarizer.compact(messages) + [query_message]
+        # List available tools for the LLM
+        available_tools = await self.list_tools()
+
+        timings = {'llm': 0.0, 'tools': 0.0} # seconds spent waiting on the LLM and on tool calls
+        query_start = time.perf_counter()
+        deadline = query_start + budget['seconds']
+        llm_calls = 0
+        tool_calls_made = 0
+        exhausted = None # the budget that ran out: 'llm_calls', 'tool_calls' or 'deadline'
+
+        tool_calls = None
+        while tool_calls is None or len(tool_calls) > 0:
+            if tool_calls and time.perf_counter() >= deadline:
+                exhausted = 'deadline'
+                tool_calls = []
+            if tool_calls and tool_calls_made + len(tool_calls) > budget['tool_calls']:
+                # Only the calls that fit are made
+                exhausted = 'tool_calls'
+                tool_calls = tool_calls[:max(0, budget['tool_calls'] - tool_calls_made)]
+            if tool_calls:
+                tool_calls_made += len(tool_calls)
+                # The calls of one turn are independent, so they run concurrently; results are added in call order
+                for tool_call in tool_calls:
+                    yield {'type': 'tool_call', 'name': tool_call['name'], 'args': tool_call['args'], 'tool_use_id': tool_call['tool_use_id']}
+                start = time.perf_counter()
+                results = [""] * len(tool_calls)
+                async with aclosing(self.iter_tool_calls(tool_calls, deadline)) as done:
+                    async for index, result in done:
+                        results[index] = result
+                        yield {'type': 'tool_result', 'name': tool_calls[index]['name'], 'tool_use_id': tool_calls[index]['tool_use_id'], 'result': result}
+                timings['tools'] += time.perf_counter() - start
+
+                for tool_call, tool_result in zip(tool_calls, results):
+                    tool_name = tool_call['name']
+                    tool_args = tool_call['args']
+                    tool_use_id = tool_call['tool_use_id']
+
+                    tool_call = self.llm.format_tool_call(tool_use_id, tool_name, tool_args)
+
+                    tool_result = self.llm.format_tool_result(tool_use_id, utils.cap_start(tool_result, self.llm.response_limit))
+
+                    messages.extend([tool_call, tool_result])
+                    history.append({
+                    'role': 'user',
+                    'content': utils.TOOL_CALL_NOTE.format(name=tool_name, args=tool_args)
+                    })
+
+            if exhausted is None and time.perf_counter() >= deadline:
+                exhausted = 'deadline'
+            # Out of budget or at the last LLM call: the tools stay in the prompt (keeping its cached prefix), but the LLM is told to answer now
+            final = exhausted is not None or llm_calls + 1 >= budget['llm_calls']
+            prompt = with_final_answer_prompt(messages) if final else messages
+
+            start = time.perf_counter()
+            response = None
+            llm_calls += 1
+            async with aclosing(self.stream_llm(messages=prompt, tools=available_tools)) as events:
+                async for event in events:
+                    if event['type'] == 'response':
+                        response = event
+                        continue
+                    if 'first_token' not in timings:
+                        timings['first_token'] = time.perf_counter() - query_start
+                    yield event
+            timings['llm'] += time.perf_counter() - start
+            if response.get('usage'):
+                self.record_usage(response['usage'], timings)
 
             llm_response = response['llm_response']
+            tool_calls = response['tool_calls']
+            if final:
+                if tool_calls:
+                    # Still asking for tools, so the query was cut short by the LLM call budget if nothing else
+                    exhausted = exhausted or 'llm_calls'
+                    print(f"Budget exhausted ({exhausted}), ignoring tool calls: {[tool_call['name'] for tool_call in tool_calls]}")
+                tool_calls = []
+                if not llm_response:
+                    llm_response = BUDGET_EXHAUSTED_RESPONSE
+                    yield {'type': 'token', 'text': llm_response}
             if (llm_response):
                 temp = {
                     'role': 'assistant',
@@ -109,16 +348,36 @@ class MCPClient:
                 }
                 messages.append(temp)
                 history.append(temp)
-            tool_calls = response['tool_calls']
-            num_tool_calls_left = len(tool_calls)
 
-        return_object = {
-            'query': query,
-            'history': history,
-            'LLM_response': llm_response,
+        if exhausted is not None:
+            print(f"Query stopped by its {exhausted} budget after {llm_calls} LLM calls and {tool_calls_made} tool calls")
+            self.budgets_exhausted[exhausted] += 1
+        # Summarizing runs in the background, the next query of this conversation picks the summary up
+        self.summarizer.schedule(history)
+        yield {
+            'type': 'final',
+            'response': {
+                'query': query,
+                'history': history,
+                'LLM_response': llm_response,
+                'budget_exhausted': exhausted,
+            },
+            'timings': timings,
         }
-        return return_object
+
+    async def process_query(self, query: str, messages: list[dict], budget: Optional[dict] = None) -> dict:
+        """Process a query and return its final response, with the timings under 'timings'"""
+        async with aclosing(self.process_query_events(query, messages, budget)) as events:
+            async for event in events:
+                if event['type'] == 'final':
+                    return {**event['response'], 'timings': event['timings']}
 
     async def cleanup(self):
         """Clean up resources"""
-        await self.exit_stack.aclose()
\ No newline at end of file
+        await self.summarizer.close()
+        await asyncio.gather(*(server.close() for server in self.servers.values()))
+        try:
+            await asyncio.to_thread(self.tool_cache.save)
+        except OSError as e:
+            print(f"Could not save the tool result cache: {e}")
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
@@ -0,0 +1,161 @@
+import asyncio
+import shlex
+from typing import Optional
+
+from mcp import StdioServerParameters, types
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from session_pool import SessionPool, sent_tool_calls
+
+def open_transport_for(target: str):
+    """
+    A function opening a transport to target: a streamable-HTTP URL, or a server script (.py or .js)
+    with optional arguments, e.g. "tools/heavy_server.py --workers 2", started as a stdio process
+    """
+    if target.startswith(("http://", "https://")):
+        return lambda: streamablehttp_client(target)
+
+    args = shlex.split(target)
+    script = args[0] if args else ""
+    is_python = script.endswith('.py')
+    is_js = script.endswith('.js')
+    if not (is_python or is_js):
+        raise ValueError(f"Server script must be a .py or .js file: {target}")
+
+    command = "python" if is_python else "node"
+    server_params = StdioServerParameters(
+        command=command,
+        args=args,
+        env=None
+    )
+    return lambda: stdio_client(server_params)
+
+class MCPServer:
+    """
+    One MCP server with its own session pool and cached tool list. It connects in the background and keeps
+    retrying until it is up, so a slow or crashed server does not hold up startup or the other servers.
+    """
+
+    def __init__(self, name: str, target: str, pool_size: int, session_concurrency: int, health_interval: float, on_tools_changed=None, retry_interval: float = 5.0):
+        self.name = name
+        self.target = target
+        self.open_transport = open_transport_for(target)
+        self.pool_size = pool_size
+        self.session_concurrency = session_concurrency
+        self.health_interval = health_interval
+        self.on_tools_changed = on_tools_changed # called when this server's tools may have changed
+        self.retry_interval = retry_interval # seconds between connection attempts
+        self.pool: Optional[SessionPool] = None
+        self.error: Optional[str] = None # why the last connection attempt failed
+        self.tools: Optional[list[types.Tool]] = None # Cached tool list, see list_tools
+        self.known_tools: list[types.Tool] = [] # The last list fetched, used while the server does not answer
+        self.tools_generation = 0 # Bumped whenever the cached tool list is invalidated
+        self.fetch: Optional[asyncio.Task] = None
+        self.connect_task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self.connect_task = asyncio.create_task(self.connect())
+        return self.connect_task
+
+    async def connect(self):
+        while True:
+            pool = SessionPool(self.open_transport, self.pool_size, self.session_concurrency, message_handler=self.handle_message, on_connect=self.invalidate_tools, health_interval=self.health_interval)
+            try:
+                await pool.start()
+            except Exception as e:
+                self.error = str(e) or type(e).__name__
+                print(f"Could not connect to MCP server {self.name}: {self.error}, retrying in {self.retry_interval:g}s")
+                await asyncio.sleep(self.retry_interval)
+                continue
+            self.pool = pool
+            self.error = None
+            # Tools listed while the pool was starting did not include this server's
+            self.invalidate_tools()
+            return
+
+    async def close(self):
+        for task in (self.connect_task, self.fetch):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    def invalidate_tools(self):
+        self.tools = None
+        self.tools_generation += 1
+        if self.on_tools_changed is not None:
+            self.on_tools_changed()
+
+    async def handle_message(self, message):
+        """Drop the cached tool list when the server reports that its tools changed"""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            self.invalidate_tools()
+
+    async def fetch_tools(self) -> list[types.Tool]:
+        generation = self.tools_generation
+        async with self.pool.checkout() as session:
+            tools = (await session.list_tools()).tools
+        self.known_tools = tools
+        if generation == self.tools_generation:
+            # Not invalidated while fetching
+            self.tools = tools
+        return tools
+
+    def fetched_late(self, fetch: asyncio.Task):
+        """Done callback of a fetch list_tools stopped waiting for"""
+        if not fetch.cancelled() and fetch.exception() is None and self.on_tools_changed is not None:
+            self.on_tools_changed()
+
+    async def list_tools(self, timeout: float) -> list[types.Tool]:
+        """
+        The server's tools, fetched once and cached until the server sends tools/list_changed or reconnects.
+        If the server does not answer within timeout seconds, the last known list is returned and the
+        fetch goes on in the background, reporting through on_tools_changed when it is done.
+        """
+        if self.tools is not None:
+            return self.tools
+        if self.pool is None:
+            return self.known_tools
+        if self.fetch is None or self.fetch.done():
+            self.fetch = asyncio.create_task(self.fetch_tools())
+        fetch = self.fetch
+        try:
+            return await asyncio.wait_for(asyncio.shield(fetch), timeout)
+        except asyncio.TimeoutError:
+            print(f"MCP server {self.name} did not list its tools within {timeout:g}s")
+            fetch.add_done_callback(self.fetched_late)
+        except Exception as e:
+            print(f"Listing the tools of MCP server {self.name} failed: {str(e) or type(e).__name__}")
+        return self.known_tools
+
+    async def call_tool(self, tool_name: str, tool_args: dict) -> types.CallToolResult:
+        """Call a tool on a pooled session, telling the server to abort it if this request is cancelled"""
+        if self.pool is None:
+            return types.CallToolResult(content=[types.TextContent(type="text", text=f"Error: the {tool_name} tool is not available yet, its server is not connected")], isError=True)
+        async with self.pool.checkout() as session:
+            request_ids = []
+            token = sent_tool_calls.set(request_ids)
+            try:
+                return await session.call_tool(tool_name, tool_args)
+            except asyncio.CancelledError:
+                if request_ids:
+                    await session.send_notification(types.ClientNotification(types.CancelledNotification(
+                        method="notifications/cancelled",
+                        params=types.CancelledNotificationParams(requestId=request_ids[0], reason="Client request cancelled"),
+                    )))
+                raise
+            finally:
+                sent_tool_calls.reset(token)
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "target": self.target,
+            "connected": self.pool is not None and any(connection["connected"] for connection in self.pool.snapshot()),
+            "error": self.error,
+            "tools": [tool.name for tool in self.known_tools],
+            "connections": self.pool.snapshot() if self.pool is not None else [],
+        }
@@ -0,0 +1,196 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+import anyio
+from mcp import ClientSession, McpError, types
+
+def is_connection_error(e: BaseException) -> bool:
+    """Whether e means the server connection is gone (e.g. the server process crashed)"""
+    if isinstance(e, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)):
+        return True
+    return isinstance(e, McpError) and e.error.code == types.CONNECTION_CLOSED
+
+# Set by a task to a list, to which the ids of the tools/call requests it sends are appended (see RequestIdTap)
+sent_tool_calls: ContextVar[list | None] = ContextVar("sent_tool_calls", default=None)
+
+class RequestIdTap:
+    """
+    Write stream of a ClientSession that notes the JSON-RPC id of each tools/call request in sent_tool_calls.
+    The session sends a request from the task that made it, so each caller sees only its own ids.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def send(self, message):
+        ids = sent_tool_calls.get()
+        request = message.message.root
+        if ids is not None and isinstance(request, types.JSONRPCRequest) and request.method == "tools/call":
+            ids.append(request.id)
+        await self.stream.send(message)
+
+    async def __aenter__(self):
+        await self.stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self.stream.__aexit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+class ServerConnection:
+    """
+    One MCP server connection (a stdio subprocess or a streamable-HTTP session) and its ClientSession.
+    The transport is opened and closed by a task of its own, since its cancel scopes must be
+    entered and exited in the same task.
+    """
+
+    def __init__(self, index: int, open_transport, message_handler=None, on_connect=None):
+        self.index = index
+        self.open_transport = open_transport # () -> async context manager yielding (read, write, ...)
+        self.message_handler = message_handler
+        self.on_connect = on_connect # called after every (re)connect, e.g. to drop cached tool lists
+        self.session: ClientSession | None = None
+        self.broken = False
+        self.in_flight = 0
+        self.restart_lock = asyncio.Lock()
+        self.task: asyncio.Task | None = None
+        self.stopping: asyncio.Event | None = None
+
+    async def run(self, ready: asyncio.Future):
+        try:
+            async with self.open_transport() as streams:
+                read, write = streams[0], streams[1]
+                async with ClientSession(read, RequestIdTap(write), message_handler=self.message_handler) as session:
+                    await session.initialize()
+                    # Fetch the tools once so the session can validate tool results without another round trip
+                    await session.list_tools()
+                    self.session = session
+                    ready.set_result(None)
+                    await self.stopping.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"MCP server connection {self.index} closed: {e}")
+        finally:
+            self.session = None
+
+    async def start(self):
+        self.broken = False
+        self.stopping = asyncio.Event()
+        ready = asyncio.get_running_loop().create_future()
+        self.task = asyncio.create_task(self.run(ready))
+        try:
+            await ready
+        except BaseException:
+            await self.stop()
+            raise
+        if self.on_connect is not None:
+            self.on_connect()
+
+    async def stop(self):
+        if self.task is not None:
+            self.stopping.set()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def restart(self):
+        print(f"Restarting MCP server connection {self.index}")
+        await self.stop()
+        await self.start()
+
+class SessionPool:
+    """
+    A fixed number of MCP server connections. Each request checks out the session with the fewest
+    requests in flight and returns it when done, so concurrent requests are spread over several
+    server processes instead of sharing one pipe (one blocking tool no longer stalls everyone).
+    Idle connections are pinged in the background, and one that fails a ping or a call is restarted.
+    """
+
+    def __init__(self, open_transport, size: int, session_concurrency: int = 4, message_handler=None, on_connect=None, health_interval: float = 15.0, ping_timeout: float = 5.0):
+        self.connections = [ServerConnection(i, open_transport, message_handler, on_connect) for i in range(size)]
+        self.session_concurrency = session_concurrency # requests in flight per session before callers wait
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.available = asyncio.Condition()
+        self.health_task: asyncio.Task | None = None
+
+    async def start(self):
+        results = await asyncio.gather(*(connection.start() for connection in self.connections), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await self.close()
+            raise errors[0]
+        self.health_task = asyncio.create_task(self.check_health())
+
+    async def close(self):
+        if self.health_task is not None:
+            self.health_task.cancel()
+            await asyncio.gather(self.health_task, return_exceptions=True)
+            self.health_task = None
+        await asyncio.gather(*(connection.stop() for connection in self.connections))
+
+    def least_loaded(self) -> ServerConnection | None:
+        candidates = [connection for connection in self.connections if connection.in_flight < self.session_concurrency]
+        # Broken connections last, so a request only waits for a restart when nothing else is free
+        return min(candidates, key=lambda connection: (connection.broken, connection.in_flight), default=None)
+
+    @asynccontextmanager
+    async def checkout_connection(self):
+        async with self.available:
+            await self.available.wait_for(lambda: self.least_loaded() is not None)
+            connection = self.least_loaded()
+            connection.in_flight += 1
+        try:
+            async with connection.restart_lock:
+                if connection.broken or connection.session is None:
+                    await connection.restart()
+            yield connection
+        except BaseException as e:
+            if is_connection_error(e):
+                # Restarted by the next checkout or health check, not on this (failed) request's time
+                connection.broken = True
+            raise
+        finally:
+            connection.in_flight -= 1
+            async with self.available:
+                self.available.notify()
+
+    @asynccontextmanager
+    async def checkout(self):
+        """Borrow a session for one request, waiting only if every session is at its concurrency limit"""
+        async with self.checkout_connection() as connection:
+            yield connection.session
+
+    async def ping(self, session: ClientSession) -> bool:
+        try:
+            await asyncio.wait_for(session.send_ping(), self.ping_timeout)
+            return True
+        except Exception as e:
+            print(f"MCP server ping failed: {str(e) or type(e).__name__}")
+            return False
+
+    async def check_health(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for connection in self.connections:
+                # A busy server may be slow to answer because of a blocking tool, so only idle ones are checked
+                if connection.in_flight > 0:
+                    continue
+                try:
+                    if connection.broken or connection.session is None or not await self.ping(connection.session):
+                        async with connection.restart_lock:
+                            await connection.restart()
+                except Exception as e:
+                    print(f"MCP server health check failed: {e}")
+
+    def snapshot(self) -> list[dict]:
+        return [{
+            "index": connection.index,
+            "connected": connection.session is not None,
+            "broken": connection.broken,
+            "in_flight": connection.in_flight,
+        } for connection in self.connections]
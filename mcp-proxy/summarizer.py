@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import ollama
+
+import utils
+from LLMs.context import is_tool_result
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and their assistant, Jarvis. "
+    "Given the previous summary (if any) and the messages that follow it, write an updated summary in at most "
+    "{words} words. Keep names, facts, numbers, preferences and open requests. Reply with the summary only."
+)
+
+class Summarizer:
+    """
+    Compacts the older part of long conversations into a rolling summary, written by a small Ollama model
+    in the background after a response was returned. Summaries are keyed by a hash of the history they
+    cover, so the next query that continues that history (from a proxy session or a stateless client)
+    sends the summary and only the most recent messages to the LLM.
+    """
+
+    def __init__(self, client=None):
+        self.model = os.getenv("JARVIS_SUMMARY_MODEL", "qwen2.5:1.5b") # empty disables summarization
+        self.keep_messages = max(1, int(os.getenv("JARVIS_SUMMARY_KEEP_MESSAGES", "8"))) # recent messages always sent as they are, at least the query
+        self.batch = int(os.getenv("JARVIS_SUMMARY_BATCH", "8")) # older messages collected before a summary is (re)written
+        self.words = int(os.getenv("JARVIS_SUMMARY_WORDS", "150"))
+        self.max_items = int(os.getenv("JARVIS_SUMMARY_MAX_ITEMS", "256"))
+        self.client = client or ollama.AsyncClient()
+        self.summaries: OrderedDict[str, str] = OrderedDict() # hash of the summarized history prefix -> summary
+        self.tasks: dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def starts_turn(message: dict) -> bool:
+        """A user query, where the messages kept after a summary may begin (not a tool call note or result)"""
+        return message['role'] == 'user' and not utils.is_tool_call_note(message) and not is_tool_result(message)
+
+    @staticmethod
+    def prefix_hashes(history: list[dict]) -> list[str]:
+        """hashes[i] identifies history[:i + 1]"""
+        digest = hashlib.sha256()
+        hashes = []
+        for message in history:
+            digest.update(json.dumps([message.get('role'), message.get('content')], sort_keys=True).encode('utf-8'))
+            digest.update(b'\0')
+            hashes.append(digest.hexdigest())
+        return hashes
+
+    def find(self, history: list[dict], hashes: list[str]) -> tuple[int, str | None]:
+        """The longest summarized prefix of history: (number of messages it covers, summary)"""
+        for n in range(len(history), 0, -1):
+            summary = self.summaries.get(hashes[n - 1])
+            if summary is not None:
+                self.summaries.move_to_end(hashes[n - 1])
+                return n, summary
+        return 0, None
+
+    def compact(self, history: list[dict]) -> list[dict]:
+        """history with its summarized prefix replaced by one system message holding the summary"""
+        if not self.model or not history:
+            return history
+        n, summary = self.find(history, self.prefix_hashes(history))
+        if summary is None:
+            return history
+        return [{'role': 'system', 'content': f"Summary of the earlier conversation: {summary}"}] + history[n:]
+
+    def schedule(self, history: list[dict]):
+        """Start updating the summary of history in the background if enough older messages piled up"""
+        if not self.model:
+            return
+        hashes = self.prefix_hashes(history)
+        n, summary = self.find(history, hashes)
+        cut = min(len(history) - 1, len(history) - self.keep_messages)
+        # The raw messages resume at a user query, never inside a tool exchange
+        while cut > n and not self.starts_turn(history[cut]):
+            cut -= 1
+        if cut - n < self.batch:
+            return
+        key = hashes[cut - 1]
+        if key in self.summaries or key in self.tasks:
+            return
+        task = asyncio.create_task(self.summarize(key, summary, history[n:cut]))
+        self.tasks[key] = task
+        task.add_done_callback(lambda _: self.tasks.pop(key, None))
+
+    async def summarize(self, key: str, previous: str | None, messages: list[dict]):
+        transcript = "\n".join(f"{'Jarvis' if message['role'] == 'assistant' else 'User'}: {message['content']}" for message in messages)
+        text = f"Previous summary: {previous}\n\nMessages:\n{transcript}" if previous else f"Messages:\n{transcript}"
+        try:
+            response = await self.client.chat(
+                model=self.model,
+                messages=[
+                    {'role': 'system', 'content': SUMMARY_PROMPT.format(words=self.words)},
+                    {'role': 'user', 'content': text},
+                ],
+                options={'num_predict': self.words * 2},
+                keep_alive="24h",
+            )
+        except ollama.ResponseError as e:
+            if e.status_code == 404:
+                print(f"Summary model {self.model} not found, pulling it")
+                await self.client.pull(self.model)
+            else:
+                print(f"Summarizing failed: {e}")
+            return
+        except Exception as e:
+            print(f"Summarizing failed: {e}")
+            return
+        summary = (response.message.content or "").strip()
+        if summary:
+            self.summaries[key] = summary
+            while len(self.summaries) > self.max_items:
+                self.summaries.popitem(last=False)
+
+    async def close(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
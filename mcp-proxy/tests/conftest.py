@@ -0,0 +1,23 @@
+import os
+import sys
+
+# Tests import the modules of this directory the way main.py does, and start bench/stub_server.py by relative path
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+os.chdir(PROJECT_DIR)
+
+import pytest # noqa: E402
+
+class OfflineOllamaAPI:
+    """Stands in for OllamaAPI, which contacts Ollama when it is created; tests give main.client an LLM of their own"""
+
+@pytest.fixture(scope="session")
+def main_module():
+    """main.py, imported without contacting Ollama"""
+    from LLMs import ollama_llms
+
+    patch = pytest.MonkeyPatch()
+    patch.setattr(ollama_llms, "OllamaAPI", OfflineOllamaAPI)
+    import main
+    patch.undo()
+    return main
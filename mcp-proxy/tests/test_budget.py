@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+@pytest.fixture
+def app(main_module):
+    return main_module.app
+
+def post_query(app, body: dict):
+    async def post():
+        response = await app.test_client().post('/query', json=body)
+        return response.status_code, await response.get_json()
+    return asyncio.run(post())
+
+@pytest.mark.parametrize("budget", [
+    {"tool_calls": 2.5},
+    {"llm_calls": 3.0},
+    {"llm_calls": True},
+    {"seconds": False},
+    {"seconds": "10"},
+    {"tool_calls": 0},
+    {"retries": 2},
+    [2],
+])
+def test_invalid_budget_is_rejected(app, budget):
+    status, body = post_query(app, {"query": "hi", "budget": budget})
+    assert status == 400
+    assert body == {'error': 'Invalid budget'}
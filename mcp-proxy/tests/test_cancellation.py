@@ -0,0 +1,54 @@
+import asyncio
+
+from mcp_flow import MCPClient
+
+class WaitingLLM:
+    """Asks for one wait_for_cancel call, so the query hangs on a pending tools/call"""
+
+    response_limit = 4000
+    context_len = 40000
+
+    def __init__(self, marker_path: str):
+        self.marker_path = marker_path
+
+    async def query_llm(self, messages: list, tools: list):
+        return {'llm_response': '', 'tool_calls': [{'name': 'wait_for_cancel', 'args': {'marker_path': self.marker_path}, 'tool_use_id': '0'}]}
+
+    def format_tool_call(self, tool_use_id, tool_name, tool_args):
+        return {'role': 'assistant', 'content': f'tool_use {tool_use_id} {tool_name} {tool_args}'}
+
+    def format_tool_result(self, tool_use_id, result):
+        return {'role': 'user', 'content': f'tool_result {tool_use_id} {result}'}
+
+def test_cancelled_query_cancels_pending_tool_call(tmp_path):
+    marker = tmp_path / "cancelled"
+
+    async def scenario():
+        client = MCPClient(WaitingLLM(str(marker)))
+        client.pool_size = 1
+        client.summarizer.model = ""
+        await client.connect_to_server("bench/stub_server.py")
+        try:
+            query = asyncio.create_task(client.process_query("Wait for me", []))
+            server = client.servers["default"]
+            connection = server.pool.connections[0]
+            for _ in range(200):
+                if connection.in_flight:
+                    break
+                await asyncio.sleep(0.01)
+            assert connection.in_flight == 1
+
+            query.cancel()
+            await asyncio.gather(query, return_exceptions=True)
+            assert query.cancelled()
+            assert connection.in_flight == 0
+            # The server cancels the tool when it gets notifications/cancelled for its tools/call
+            for _ in range(200):
+                if marker.exists():
+                    break
+                await asyncio.sleep(0.01)
+            assert marker.read_text() == "cancelled"
+        finally:
+            await client.cleanup()
+
+    asyncio.run(scenario())
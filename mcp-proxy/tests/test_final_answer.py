@@ -0,0 +1,82 @@
+import asyncio
+
+from LLMs.claude import AnthropicAPI
+from mcp_flow import FINAL_ANSWER_PROMPT, MCPClient, with_final_answer_prompt
+
+class SearchingLLM:
+    """Asks for one search on every call (even when told to answer) unless searches is 0, recording each prompt"""
+
+    response_limit = 4000
+    context_len = 40000
+
+    def __init__(self, searches: int):
+        self.searches = searches
+        self.prompts: list[list[dict]] = []
+
+    async def query_llm(self, messages: list, tools: list):
+        self.prompts.append(list(messages))
+        if len(self.prompts) > self.searches:
+            return {'llm_response': 'Here is what I found, sir.', 'tool_calls': []}
+        return {'llm_response': 'Here is what I found so far, sir.', 'tool_calls': [{'name': 'get_time', 'args': {}, 'tool_use_id': str(len(self.prompts))}]}
+
+    def format_tool_call(self, tool_use_id, tool_name, tool_args):
+        return {'role': 'assistant', 'content': f'type=tool_use {tool_use_id} {tool_name} {tool_args}'}
+
+    def format_tool_result(self, tool_use_id, result):
+        return {'role': 'user', 'content': f'type=tool_result {tool_use_id} {result}'}
+
+def run_query(llm: SearchingLLM, budget: dict) -> tuple[dict, MCPClient]:
+    async def scenario():
+        client = MCPClient(llm)
+        client.pool_size = 1
+        client.summarizer.model = ""
+        await client.connect_to_server("bench/stub_server.py")
+        try:
+            return await client.process_query("What time is it?", [], budget), client
+        finally:
+            await client.cleanup()
+    return asyncio.run(scenario())
+
+def without_cache_control(messages: list[dict]) -> list[dict]:
+    """The messages as sent, apart from where prepare marks the end of the cached prefix"""
+    def blocks(content):
+        if isinstance(content, str):
+            return content
+        return [{key: value for key, value in block.items() if key != 'cache_control'} for block in content]
+    return [{**message, 'content': blocks(message['content'])} for message in messages]
+
+def test_last_call_keeps_the_prompt_prefix():
+    llm = SearchingLLM(searches=10)
+    response, client = run_query(llm, {'llm_calls': 2})
+    before, last = llm.prompts
+    assert last[:len(before)] == before
+    assert all(message['role'] != 'system' for message in last)
+    assert last[-1]['content'].startswith('type=tool_result 1 ')
+    assert last[-1]['content'].endswith(FINAL_ANSWER_PROMPT)
+    # Asked for a search anyway, so the LLM call budget did cut the query short
+    assert response['budget_exhausted'] == 'llm_calls'
+    assert client.budgets_exhausted == {'llm_calls': 1}
+
+def test_last_call_keeps_anthropic_system_and_message_blocks(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    claude = AnthropicAPI()
+    messages = [
+        {'role': 'system', 'content': 'Summary of the conversation so far'},
+        {'role': 'user', 'content': 'What time is it?'},
+        claude.format_tool_call('toolu_1', 'get_time', {}),
+        claude.format_tool_result('toolu_1', '12:00'),
+    ]
+    before, _, system_before, _ = claude.prepare(messages, [])
+    last, _, system_last, _ = claude.prepare(with_final_answer_prompt(messages), [])
+    assert system_last == system_before
+    before, last = without_cache_control(before), without_cache_control(last)
+    assert last[:-1] == before[:-1]
+    assert last[-1]['content'][:-1] == before[-1]['content']
+    assert last[-1]['content'][-1] == {'type': 'text', 'text': FINAL_ANSWER_PROMPT}
+
+def test_answer_within_the_last_call_is_not_exhaustion():
+    llm = SearchingLLM(searches=0)
+    response, client = run_query(llm, {'llm_calls': 1})
+    assert response['LLM_response'] == 'Here is what I found, sir.'
+    assert response['budget_exhausted'] is None
+    assert client.budgets_exhausted == {}
@@ -0,0 +1,14 @@
+from types import SimpleNamespace
+
+from LLMs.ollama_llms import OllamaAPI
+
+def ollama_tool_call(name: str, arguments: dict):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+def test_parallel_tool_calls_get_their_own_ids():
+    llm = OllamaAPI.__new__(OllamaAPI) # without loading the model
+    llm.tool_use_id_counter = 7
+    searches = [ollama_tool_call('search_the_internet', {'query': topic}) for topic in ('weather', 'news', 'stocks')]
+    tool_calls = llm.parse_response("", searches)['tool_calls']
+    assert [tool_call['args']['query'] for tool_call in tool_calls] == ['weather', 'news', 'stocks']
+    assert len({tool_call['tool_use_id'] for tool_call in tool_calls}) == 3
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import pytest
+
+from mcp_flow import MCPClient
+
+LLM_SECONDS = 1.0
+
+class SlowLLM:
+    response_limit = 4000
+    context_len = 40000
+
+    def format_tool_call(self, tool_use_id, tool_name, tool_args):
+        return {'role': 'assistant', 'content': f'tool_use {tool_use_id} {tool_name} {tool_args}'}
+
+    def format_tool_result(self, tool_use_id, result):
+        return {'role': 'user', 'content': f'tool_result {tool_use_id} {result}'}
+
+class SyncLLM(SlowLLM):
+    """A synchronous adapter, run in the LLM thread pool"""
+
+    def query_llm(self, messages: list, tools: list):
+        time.sleep(LLM_SECONDS)
+        return {'llm_response': 'Done, sir.', 'tool_calls': []}
+
+class AsyncLLM(SlowLLM):
+    async def query_llm(self, messages: list, tools: list):
+        await asyncio.sleep(LLM_SECONDS)
+        return {'llm_response': 'Done, sir.', 'tool_calls': []}
+
+@pytest.mark.parametrize("llm_class", [SyncLLM, AsyncLLM])
+def test_health_answers_while_llm_calls_run(main_module, monkeypatch, llm_class):
+    async def scenario():
+        client = MCPClient(llm_class())
+        client.pool_size = 1
+        client.summarizer.model = ""
+        monkeypatch.setattr(main_module, "client", client)
+        await client.connect_to_server("bench/stub_server.py")
+        test_client = main_module.app.test_client()
+        try:
+            queries = [asyncio.create_task(test_client.post('/query', json={'query': f'Question {i}', 'history': []})) for i in range(2)]
+            await asyncio.sleep(0.1) # let the LLM calls start
+            latencies = []
+            while not all(query.done() for query in queries):
+                start = time.perf_counter()
+                response = await test_client.get('/health')
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+                await asyncio.sleep(0.05)
+            for query in queries:
+                assert (await query).status_code == 200
+            assert len(latencies) >= 5
+            assert max(latencies) < LLM_SECONDS / 4
+        finally:
+            await client.cleanup()
+
+    asyncio.run(scenario())
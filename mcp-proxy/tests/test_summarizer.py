@@ -0,0 +1,48 @@
+import asyncio
+
+import utils
+from summarizer import Summarizer
+
+def conversation(turns: int) -> list[dict]:
+    """Turns of a query, one or two tool call notes and an answer, as process_query returns them"""
+    history = []
+    for turn in range(turns):
+        history.append({'role': 'user', 'content': f"Question {turn}"})
+        for search in range(1 + turn % 2):
+            history.append({'role': 'user', 'content': utils.TOOL_CALL_NOTE.format(name='search_the_internet', args={'query': f"{turn}.{search}"})})
+        history.append({'role': 'assistant', 'content': f"Answer {turn}"})
+    return history
+
+def scheduled_cuts(summarizer: Summarizer, history: list[dict]) -> list[int]:
+    """Number of messages each summary scheduled for history would cover"""
+    cuts = []
+
+    async def summarize(key, previous, messages):
+        cuts.append(len(messages))
+
+    async def scenario():
+        summarizer.summarize = summarize
+        summarizer.schedule(history)
+        await asyncio.gather(*summarizer.tasks.values())
+
+    asyncio.run(scenario())
+    return cuts
+
+def test_kept_messages_start_at_a_query_not_a_tool_call_note():
+    history = conversation(12)
+    for keep in range(1, 12):
+        summarizer = Summarizer(client=object())
+        summarizer.keep_messages = keep
+        summarizer.batch = 2
+        for cut in scheduled_cuts(summarizer, history):
+            assert summarizer.starts_turn(history[cut])
+            assert len(history) - cut >= keep
+
+def test_keeping_zero_messages_is_clamped(monkeypatch):
+    monkeypatch.setenv("JARVIS_SUMMARY_KEEP_MESSAGES", "0")
+    summarizer = Summarizer(client=object())
+    summarizer.batch = 2
+    assert summarizer.keep_messages == 1
+    history = conversation(6)
+    cuts = scheduled_cuts(summarizer, history)
+    assert cuts and summarizer.starts_turn(history[cuts[0]])
@@ -0,0 +1,118 @@
+import json
+import os
+import time
+from collections import OrderedDict, defaultdict
+
+CACHE_TTL_META_KEY = "jarvis/cache_ttl" # seconds, declared by the server in a tool's _meta
+
+def canonical_args(value):
+    """Tool arguments in a canonical form: strings with collapsed whitespace (dicts are key-sorted when dumped)"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {str(key): canonical_args(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical_args(item) for item in value]
+    return value
+
+def cache_key(tool_name: str, tool_args) -> str:
+    return json.dumps([tool_name, canonical_args(tool_args or {})], sort_keys=True, separators=(",", ":"), default=str)
+
+class CacheEntry:
+    def __init__(self, tool_name: str, text: str, expires_at: float, seconds: float):
+        self.tool_name = tool_name
+        self.text = text
+        self.expires_at = expires_at # wall clock, so entries loaded from disk keep their expiry
+        self.seconds = seconds # how long the call took, i.e. the latency a hit saves
+        self.size = len(text.encode("utf-8"))
+
+class ToolResultCache:
+    """
+    Text results of tool calls, keyed by tool name and canonicalized arguments. Each entry lives for
+    its tool's TTL, and the least recently used entries are evicted once the results exceed max_bytes.
+    With a path the cache is loaded from and saved to a JSON file, so it survives restarts.
+    """
+
+    def __init__(self, max_bytes: int, path: str | None = None):
+        self.max_bytes = max_bytes
+        self.path = os.path.expanduser(path) if path else None
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.size = 0 # bytes of all cached results
+        self.hits = defaultdict(int) # per tool
+        self.misses = defaultdict(int)
+        self.seconds_saved = defaultdict(float)
+
+    def remove(self, key: str):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+
+    def get(self, tool_name: str, key: str) -> str | None:
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires_at <= time.time():
+            self.remove(key)
+            entry = None
+        if entry is None:
+            self.misses[tool_name] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits[tool_name] += 1
+        self.seconds_saved[tool_name] += entry.seconds
+        return entry.text
+
+    def put(self, tool_name: str, key: str, text: str, ttl: float, seconds: float):
+        entry = CacheEntry(tool_name, text, time.time() + ttl, seconds)
+        if entry.size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            self.remove(next(iter(self.entries)))
+
+    def load(self):
+        """Read the entries saved by save(), skipping expired ones"""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load the tool result cache from {self.path}: {e}")
+            return
+        now = time.time()
+        for item in saved:
+            ttl = item["expires_at"] - now
+            if ttl > 0:
+                self.put(item["tool_name"], item["key"], item["text"], ttl, item.get("seconds", 0.0))
+
+    def save(self):
+        """Write the unexpired entries to the cache file (atomically)"""
+        if self.path is None:
+            return
+        now = time.time()
+        saved = [{
+            "key": key,
+            "tool_name": entry.tool_name,
+            "text": entry.text,
+            "expires_at": entry.expires_at,
+            "seconds": entry.seconds,
+        } for key, entry in self.entries.items() if entry.expires_at > now]
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(saved, f)
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> dict:
+        tools = sorted(set(self.hits) | set(self.misses))
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "tools": {tool: {
+                "hits": self.hits[tool],
+                "misses": self.misses[tool],
+                "seconds_saved": round(self.seconds_saved[tool], 3),
+            } for tool in tools},
+        }
@@ -53,8 +53,23 @@ def parse_tool_string(tool_string):
         "input": input_data
     }
 
+TOOL_CALL_NOTE = "Tool called: {name} with arguments: {args}" # how a tool call is recorded in the history returned to clients
+
+def is_tool_call_note(message: dict) -> bool:
+    content = message.get('content')
+    return message.get('role') == 'user' and isinstance(content, str) and content.startswith(TOOL_CALL_NOTE.split('{')[0])
+
 def cap_start(s, limit):
     return s if len(s) <= limit else s[:limit - 3] + "...and more"
 
 def cap_end(s, limit):
     return s if len(s) <= limit else "..." + s[-(limit - 3):]
+
+def parse_key_values(s, value_type=str):
+    """Parse "key=value,key2=value2" (e.g. from an environment variable) into a dict"""
+    items = {}
+    for part in s.split(','):
+        if '=' in part:
+            key, value = part.split('=', 1)
+            items[key.strip()] = value_type(value.strip())
+    return items
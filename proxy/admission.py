@@ -0,0 +1,133 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from metrics import metrics
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0 # Voice queries, someone is waiting to hear the answer
+PRIORITY_NORMAL = 1 # Text queries (jarvis-mc chat, typed questions)
+PRIORITY_BACKGROUND = 2
+PRIORITIES = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "normal": PRIORITY_NORMAL,
+    "background": PRIORITY_BACKGROUND,
+}
+
+MAX_QUEUED = int(os.getenv("JARVIS_MAX_QUEUED", "32")) # waiting requests per backend
+DEFAULT_DEADLINE = float(os.getenv("JARVIS_DEFAULT_DEADLINE", "60.0")) # seconds a request may wait to start a backend call
+
+class AdmissionRejected(Exception):
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class QueueFull(AdmissionRejected):
+    status_code = 429
+
+class DeadlineExceeded(AdmissionRejected):
+    status_code = 503
+
+# (priority, absolute deadline on the monotonic clock) of the request being handled.
+# Tasks spawned by a handler inherit it, so backend calls never need it passed explicitly.
+request_budget: ContextVar[tuple[int, float | None]] = ContextVar("request_budget", default=(PRIORITY_NORMAL, None))
+
+def set_request_budget(priority: int, timeout: float | None = DEFAULT_DEADLINE):
+    deadline = time.monotonic() + timeout if timeout else None
+    request_budget.set((priority, deadline))
+
+class AdmissionQueue:
+    """
+    Limits concurrent calls to one backend. Callers over the limit wait in a bounded priority queue
+    and are rejected up front when the queue is full or they cannot start before their deadline.
+    The limit may be a function, e.g. of how many of the backend's replicas are up.
+    """
+
+    def __init__(self, name: str, concurrency: int | Callable[[], int], max_queued: int = MAX_QUEUED):
+        self.name = name
+        self.limit = concurrency
+        self.max_queued = max_queued
+        self.active = 0
+        self.waiters: list[tuple[int, int, asyncio.Future]] = [] # heap of (priority, arrival order, future)
+        self.counter = itertools.count()
+        self.service_time = 1.0 # moving average of how long a slot is held (seconds)
+
+    @property
+    def concurrency(self) -> int:
+        return self.limit() if callable(self.limit) else self.limit
+
+    def estimated_wait(self, priority: int) -> float:
+        ahead = sum(1 for waiter_priority, _, future in self.waiters if waiter_priority <= priority and not future.done())
+        return self.service_time * (ahead + 1) / self.concurrency
+
+    def reject(self, error: AdmissionRejected):
+        metrics.queue_rejections[self.name] += 1
+        raise error
+
+    def admit(self, priority: int):
+        """Reject a request up front when the queue is full. Its calls then use slot(admitted=True)"""
+        if len(self.waiters) >= self.max_queued:
+            self.reject(QueueFull(f"{self.name.upper()} queue is full", retry_after=self.estimated_wait(priority)))
+
+    async def acquire(self, priority: int, deadline: float | None, admitted: bool = False):
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            return
+
+        if not admitted:
+            self.admit(priority)
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and self.estimated_wait(priority) > remaining:
+            self.reject(DeadlineExceeded(f"{self.name.upper()} cannot start before the request deadline", retry_after=self.estimated_wait(priority)))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self.counter), future)
+        heapq.heappush(self.waiters, entry)
+        metrics.queue_waiting[self.name] = len(self.waiters)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=remaining)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if entry in self.waiters:
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up, pass it on
+                self.release_slot()
+            else:
+                future.cancel()
+            metrics.queue_waiting[self.name] = len(self.waiters)
+            if isinstance(e, asyncio.TimeoutError):
+                self.reject(DeadlineExceeded(f"{self.name.upper()} did not start before the request deadline"))
+            raise
+
+    def release_slot(self):
+        self.active -= 1
+        # Usually one slot is handed over, more if the limit went up since (e.g. a replica recovered)
+        while self.waiters and self.active < self.concurrency:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+        metrics.queue_waiting[self.name] = len(self.waiters)
+
+    @asynccontextmanager
+    async def slot(self, admitted: bool = False):
+        """
+        Hold one of the backend's slots, using the current request's priority and deadline. With admitted,
+        the request already passed admit() (e.g. a later sentence of an answer), so a full queue does not reject it.
+        """
+        priority, deadline = request_budget.get()
+        await self.acquire(priority, deadline, admitted)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.service_time = 0.8 * self.service_time + 0.2 * (time.perf_counter() - start)
+            self.release_slot()
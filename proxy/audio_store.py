@@ -0,0 +1,31 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from utils import evict_expired
+
+AUDIO_TTL = float(os.getenv("JARVIS_AUDIO_TTL", "120.0")) # seconds
+AUDIO_MAX_ITEMS = int(os.getenv("JARVIS_AUDIO_MAX_ITEMS", "256"))
+
+class AudioStore:
+    """In-memory store of synthesized audio, fetchable by id until it expires"""
+
+    def __init__(self, ttl: float = AUDIO_TTL, max_items: int = AUDIO_MAX_ITEMS):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.items: OrderedDict[str, tuple[float, bytes, str]] = OrderedDict() # id -> (expires_at, data, mimetype)
+
+    def put(self, data: bytes, mimetype: str = "audio/wav") -> str:
+        audio_id = uuid.uuid4().hex
+        self.items[audio_id] = (time.monotonic() + self.ttl, data, mimetype)
+        evict_expired(self.items, self.max_items)
+        return audio_id
+
+    def get(self, audio_id: str) -> tuple[bytes, str] | None:
+        evict_expired(self.items, self.max_items)
+        item = self.items.get(audio_id)
+        if item is None:
+            return None
+        _, data, mimetype = item
+        return data, mimetype
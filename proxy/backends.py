@@ -0,0 +1,237 @@
+import asyncio
+import os
+import random
+
+import httpx
+
+from admission import AdmissionQueue
+from health import BackendUnavailable, CircuitBreaker, HealthMonitor
+from metrics import metrics
+
+def parse_urls(value: str) -> list[str]:
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+def parse_seconds(value: str | None) -> float | None:
+    return float(value) if value else None
+
+# Backend base URLs, a comma-separated list of replicas each
+STT_URLS = parse_urls(os.getenv("JARVIS_STT_URL", "http://localhost:5001"))
+MCP_URLS = parse_urls(os.getenv("JARVIS_MCP_URL", "http://127.0.0.1:5000"))
+TTS_URLS = parse_urls(os.getenv("JARVIS_TTS_URL", "http://localhost:5008"))
+
+# Health endpoints, relative to the base URLs
+STT_HEALTH_PATH = os.getenv("JARVIS_STT_HEALTH_PATH", "/health")
+MCP_HEALTH_PATH = os.getenv("JARVIS_MCP_HEALTH_PATH", "/health")
+TTS_HEALTH_PATH = os.getenv("JARVIS_TTS_HEALTH_PATH", "/health")
+
+# Connection pool limits (per replica)
+MAX_CONNECTIONS = int(os.getenv("JARVIS_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("JARVIS_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("JARVIS_KEEPALIVE_EXPIRY", "60.0"))
+
+# Maximum concurrent requests sent to each replica, extra requests wait in the backend's admission queue
+STT_CONCURRENCY = int(os.getenv("JARVIS_STT_CONCURRENCY", "2"))
+MCP_CONCURRENCY = int(os.getenv("JARVIS_MCP_CONCURRENCY", "4"))
+TTS_CONCURRENCY = int(os.getenv("JARVIS_TTS_CONCURRENCY", "4"))
+
+# Seconds before an unanswered STT/TTS call is repeated on a second replica (unset = no hedging).
+# MCP queries run tools with side effects and are never hedged.
+STT_HEDGE_AFTER = parse_seconds(os.getenv("JARVIS_STT_HEDGE_AFTER"))
+TTS_HEDGE_AFTER = parse_seconds(os.getenv("JARVIS_TTS_HEDGE_AFTER"))
+
+# Per-stage timeouts (seconds)
+CONNECT_TIMEOUT = float(os.getenv("JARVIS_CONNECT_TIMEOUT", "5.0"))
+STT_TIMEOUT = float(os.getenv("JARVIS_STT_TIMEOUT", "30.0"))
+MCP_TIMEOUT = float(os.getenv("JARVIS_MCP_TIMEOUT", "120.0"))
+TTS_TIMEOUT = float(os.getenv("JARVIS_TTS_TIMEOUT", "120.0"))
+
+def create_client(base_url: str, timeout: float) -> httpx.AsyncClient:
+    """Create a long-lived client with its own connection pool for one replica"""
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        base_url=base_url,
+        limits=limits,
+        timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+    )
+
+def raise_for_server_error(response: httpx.Response):
+    """Raise on 5xx so the circuit breaker counts it; 4xx means a bad request, not a bad backend"""
+    if response.is_server_error:
+        response.raise_for_status()
+
+class Replica:
+    def __init__(self, backend: str, url: str):
+        self.url = url
+        self.key = f"{backend} {url}"
+        self.client: httpx.AsyncClient | None = None
+        self.breaker = CircuitBreaker(f"{backend.upper()} replica {url}")
+        self.outstanding = 0
+
+class ReplicaPool:
+    """
+    Spreads one backend's calls over its replicas. Each call goes to the available replica with the
+    fewest outstanding requests, and replicas whose circuit breaker is open are skipped until they
+    recover. Idempotent calls can be hedged: if the first replica has not answered after hedge_after
+    seconds, the call is repeated on a second replica that is below its concurrency limit, and the
+    first response wins.
+    """
+
+    def __init__(self, name: str, urls: list[str], timeout: float, concurrency: int, hedge_after: float | None = None):
+        self.name = name
+        self.timeout = timeout
+        self.concurrency = concurrency # calls per replica
+        self.hedge_after = hedge_after
+        self.replicas = [Replica(name, url) for url in urls]
+
+    def start(self):
+        for replica in self.replicas:
+            replica.client = create_client(replica.url, self.timeout)
+
+    async def close(self):
+        for replica in self.replicas:
+            if replica.client is not None:
+                await replica.client.aclose()
+                replica.client = None
+
+    def capacity(self) -> int:
+        """Calls to admit at once: concurrency for each replica whose breaker is not open (at least one replica's worth)"""
+        up = sum(1 for replica in self.replicas if replica.breaker.state != "open")
+        return self.concurrency * max(1, up)
+
+    def unavailable(self) -> BackendUnavailable:
+        """The error for a call no replica can take, retried once the first breaker lets a trial through"""
+        retry_after = min((replica.breaker.retry_after for replica in self.replicas), default=None)
+        return BackendUnavailable(f"{self.name.upper()} is unavailable", retry_after=retry_after or None)
+
+    def check(self):
+        """Fail fast, before queueing, when no replica can take a call"""
+        if not any(replica.breaker.available for replica in self.replicas):
+            raise self.unavailable()
+
+    def pick(self, exclude: list[Replica], below_limit: bool = False) -> Replica | None:
+        candidates = [
+            replica for replica in self.replicas
+            if replica not in exclude and replica.breaker.available and (not below_limit or replica.outstanding < self.concurrency)
+        ]
+        if not candidates:
+            return None
+        fewest = min(replica.outstanding for replica in candidates)
+        return random.choice([replica for replica in candidates if replica.outstanding == fewest])
+
+    async def send(self, replica: Replica, method: str, url: str, **kwargs) -> httpx.Response:
+        replica.outstanding += 1
+        metrics.replica_in_flight[replica.key] += 1
+        metrics.replica_requests[replica.key] += 1
+        try:
+            with replica.breaker.guard():
+                response = await replica.client.request(method, url, **kwargs)
+                raise_for_server_error(response)
+            return response
+        finally:
+            replica.outstanding -= 1
+            metrics.replica_in_flight[replica.key] -= 1
+
+    async def hedged(self, primary: Replica, tried: list[Replica], method: str, url: str, **kwargs) -> httpx.Response:
+        tasks = [asyncio.create_task(self.send(primary, method, url, **kwargs))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            # A hedge takes no admission slot, so it only goes to a replica with room to spare
+            backup = None if done else self.pick(exclude=tried, below_limit=True)
+            if backup is None:
+                return await tasks[0]
+
+            tried.append(backup)
+            metrics.hedged_requests[self.name] += 1
+            tasks.append(asyncio.create_task(self.send(backup, method, url, **kwargs)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            metrics.hedge_wins[self.name] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def request(self, method: str, url: str, hedge: bool = False, **kwargs) -> httpx.Response:
+        """
+        Send one call to the least loaded available replica. A replica that refuses the connection is
+        skipped for the next one, since the call never reached it; when every replica refused, the backend
+        is unavailable. Set hedge only for idempotent calls.
+        """
+        tried: list[Replica] = []
+        error = None
+        while True:
+            replica = self.pick(exclude=tried)
+            if replica is None:
+                raise self.unavailable() from error
+            tried.append(replica)
+            try:
+                if hedge and self.hedge_after is not None:
+                    return await self.hedged(replica, tried, method, url, **kwargs)
+                return await self.send(replica, method, url, **kwargs)
+            except httpx.ConnectError as e:
+                error = e
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+class Backends:
+    """Owns one replica pool, admission queue and set of health probes per downstream service"""
+
+    def __init__(self):
+        self.stt = ReplicaPool("stt", STT_URLS, STT_TIMEOUT, STT_CONCURRENCY, STT_HEDGE_AFTER)
+        self.mcp = ReplicaPool("mcp", MCP_URLS, MCP_TIMEOUT, MCP_CONCURRENCY)
+        self.tts = ReplicaPool("tts", TTS_URLS, TTS_TIMEOUT, TTS_CONCURRENCY, TTS_HEDGE_AFTER)
+        self.pools = {"stt": self.stt, "mcp": self.mcp, "tts": self.tts}
+        # The concurrency limits are per replica, so a backend's queue admits that many calls per replica that is up
+        self.queues = {name: AdmissionQueue(name, pool.capacity) for name, pool in self.pools.items()}
+        health_paths = {"stt": STT_HEALTH_PATH, "mcp": MCP_HEALTH_PATH, "tts": TTS_HEALTH_PATH}
+        targets, breakers = {}, {}
+        for name, pool in self.pools.items():
+            for replica in pool.replicas:
+                targets[replica.key] = replica.url + health_paths[name]
+                breakers[replica.key] = replica.breaker
+        self.monitor = HealthMonitor(targets, breakers)
+
+    def start(self, monitor_health: bool = True):
+        for pool in self.pools.values():
+            pool.start()
+        if monitor_health:
+            self.monitor.start()
+
+    async def close(self):
+        await self.monitor.stop()
+        for pool in self.pools.values():
+            await pool.close()
+
+    def health(self) -> dict:
+        """
+        Per-backend health from the latest probes: healthy while any replica is, down once every
+        replica failed, and None until a replica has been probed.
+        """
+        probes = self.monitor.snapshot()
+        report = {}
+        for name, pool in self.pools.items():
+            replicas = {replica.url: {**probes[replica.key], "outstanding": replica.outstanding} for replica in pool.replicas}
+            states = [result["healthy"] for result in replicas.values()]
+            if True in states:
+                healthy = True
+            elif all(state is False for state in states):
+                healthy = False
+            else:
+                healthy = None
+            report[name] = {"healthy": healthy, "replicas": replicas}
+        return report
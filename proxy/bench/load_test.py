@@ -0,0 +1,201 @@
+"""
+Open-loop load test of the proxy. Starts the stub STT, MCP and TTS servers and
+the proxy (under hypercorn) as separate processes, then sends audio and text
+queries with Poisson arrivals at a fixed rate, whether or not earlier requests
+have finished, and reports throughput, p50/p95/p99 latency and error rates.
+
+Run from the proxy directory:
+    python -m bench.load_test --rate 5,10,20 --duration 30 --mcp-latency lognormal:1.0,0.5
+    python -m bench.load_test --target http://127.0.0.1:5002 --rate 10    (an already running proxy)
+
+With --max-p99 and/or --max-error-rate the exit code is 1 when a rate exceeds them.
+Proxy settings (JARVIS_*) are taken from the environment.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from bench.stub_backends import fake_wav, stub_env
+
+PROXY_PORT = 15002
+
+class Result:
+    def __init__(self, kind: str, latency: float, status: int | None, error: str | None = None):
+        self.kind = kind
+        self.latency = latency # seconds
+        self.status = status
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status == 200
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+async def start_process(*args: str, env: dict | None = None) -> asyncio.subprocess.Process:
+    return await asyncio.create_subprocess_exec(
+        sys.executable, *args,
+        env={**os.environ, **(env or {})},
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+
+async def wait_until_up(client: httpx.AsyncClient, url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get(url)
+            if response.status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+async def send_audio_query(client: httpx.AsyncClient, target: str, upload: bytes, use_tts: bool) -> int:
+    response = await client.post(
+        f"{target}/proxy/audio-query",
+        files={"file": ("audio.wav", upload, "audio/wav")},
+        data={"history": "[]", "use_tts": str(use_tts).lower()},
+    )
+    return response.status_code
+
+async def send_text_query(client: httpx.AsyncClient, target: str, index: int) -> int:
+    # Distinct queries, so single-flight coalescing does not hide the load
+    response = await client.post(f"{target}/proxy/text-query", data={"history": "[]", "query": f"Question number {index}"})
+    return response.status_code
+
+async def run_rate(client: httpx.AsyncClient, args, rate: float, upload: bytes) -> dict:
+    results: list[Result] = []
+    tasks = []
+
+    async def one(kind: str, index: int):
+        start = time.perf_counter()
+        try:
+            if kind == "audio":
+                status = await send_audio_query(client, args.target, upload, args.use_tts)
+            else:
+                status = await send_text_query(client, args.target, index)
+            results.append(Result(kind, time.perf_counter() - start, status))
+        except httpx.HTTPError as e:
+            results.append(Result(kind, time.perf_counter() - start, None, type(e).__name__))
+
+    start = time.perf_counter()
+    next_arrival = start
+    index = 0
+    while True:
+        # Open loop: arrivals follow a Poisson process regardless of how many requests are outstanding
+        next_arrival += random.expovariate(rate)
+        if next_arrival - start > args.duration:
+            break
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        kind = "text" if random.random() < args.text_ratio else "audio"
+        tasks.append(asyncio.create_task(one(kind, index)))
+        index += 1
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    summary = {"rate": rate, "sent": len(results), "elapsed": round(elapsed, 2), "kinds": {}}
+    for kind in ("all", "audio", "text"):
+        selected = [r for r in results if kind == "all" or r.kind == kind]
+        if not selected:
+            continue
+        latencies = sorted(r.latency * 1000 for r in selected if r.ok)
+        errors = Counter(r.error or str(r.status) for r in selected if not r.ok)
+        summary["kinds"][kind] = {
+            "sent": len(selected),
+            "throughput": round(len(latencies) / elapsed, 2), # successful responses per second
+            "error_rate": round(1 - len(latencies) / len(selected), 4),
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "errors": dict(errors),
+        }
+    return summary
+
+def print_summary(summary: dict):
+    print(f"\nrate {summary['rate']}/s, {summary['sent']} requests in {summary['elapsed']}s")
+    print(f"{'kind':<6} {'sent':>6} {'ok/s':>7} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9}  error breakdown")
+    for kind, stats in summary["kinds"].items():
+        print(
+            f"{kind:<6} {stats['sent']:>6} {stats['throughput']:>7} {stats['error_rate']:>7.1%} "
+            f"{stats['p50']:>7.1f}ms {stats['p95']:>7.1f}ms {stats['p99']:>7.1f}ms  {stats['errors'] or ''}"
+        )
+
+async def main_async(args) -> int:
+    processes = []
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        try:
+            if args.target is None:
+                args.target = f"http://127.0.0.1:{PROXY_PORT}"
+                stub_args = [
+                    "--stt-latency", args.stt_latency, "--mcp-latency", args.mcp_latency, "--tts-latency", args.tts_latency,
+                    "--wav-bytes", str(args.wav_bytes),
+                ]
+                if args.response_chars is not None:
+                    stub_args += ["--response-chars", str(args.response_chars)]
+                processes.append(await start_process("-m", "bench.stub_backends", *stub_args))
+                processes.append(await start_process("-m", "hypercorn", "main:app", "--bind", f"127.0.0.1:{PROXY_PORT}", env=stub_env()))
+                for url in stub_env().values():
+                    await wait_until_up(client, f"{url}/health")
+            await wait_until_up(client, f"{args.target}/proxy/health")
+
+            upload = fake_wav(args.upload_bytes)
+            summaries = []
+            for rate in args.rate:
+                summary = await run_rate(client, args, rate, upload)
+                print_summary(summary)
+                summaries.append(summary)
+        finally:
+            for process in processes:
+                process.terminate()
+                await process.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summaries, f, indent=2)
+
+    failed = False
+    for summary in summaries:
+        stats = summary["kinds"]["all"]
+        if args.max_p99 is not None and not stats["p99"] <= args.max_p99:
+            print(f"FAIL: p99 {stats['p99']}ms at {summary['rate']}/s exceeds {args.max_p99}ms")
+            failed = True
+        if args.max_error_rate is not None and stats["error_rate"] > args.max_error_rate:
+            print(f"FAIL: error rate {stats['error_rate']:.1%} at {summary['rate']}/s exceeds {args.max_error_rate:.1%}")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default=None, help="URL of a running proxy (default: start the stubs and a proxy)")
+    parser.add_argument("--rate", type=lambda value: [float(rate) for rate in value.split(",")], default=[5.0], help="arrivals per second, comma-separated to step through several")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals per rate")
+    parser.add_argument("--text-ratio", type=float, default=0.5, help="fraction of text queries, the rest are audio queries")
+    parser.add_argument("--use-tts", action="store_true", help="request synthesized speech on audio queries")
+    parser.add_argument("--upload-bytes", type=int, default=96_000, help="size of each uploaded WAV (3s of 16kHz audio)")
+    parser.add_argument("--stt-latency", default="lognormal:0.3,0.3")
+    parser.add_argument("--mcp-latency", default="lognormal:1.0,0.5")
+    parser.add_argument("--tts-latency", default="lognormal:0.2,0.3", help="per sentence")
+    parser.add_argument("--wav-bytes", type=int, default=64_000, help="size of each synthesized sentence")
+    parser.add_argument("--response-chars", type=int, default=None, help="length of the MCP answer")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--max-p99", type=float, default=None, help="fail if the p99 latency (ms) exceeds this")
+    parser.add_argument("--max-error-rate", type=float, default=None, help="fail if the error rate (0-1) exceeds this")
+    parser.add_argument("--json", default=None, help="also write the summaries to this file")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
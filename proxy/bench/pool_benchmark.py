@@ -0,0 +1,84 @@
+"""
+Compare per-request latency of the STT -> MCP -> TTS pipeline when every
+request builds its own HTTP clients (the old behaviour) versus reusing the
+pooled clients owned by the gateway.
+
+Run from the proxy directory:
+    python -m bench.pool_benchmark --requests 200
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+
+from bench.stub_backends import run_stub_backends, stub_env
+
+os.environ.update(stub_env())
+
+import main # noqa: E402 (must be imported after the stub URLs are set)
+from backends import Backends # noqa: E402
+
+class UploadedFile:
+    """Minimal stand-in for the FileStorage Quart hands to transcribe_file"""
+
+    def __init__(self, data: bytes):
+        self.filename = "audio.wav"
+        self.content_type = "audio/wav"
+        self.stream = io.BytesIO(data)
+
+async def run_pipeline():
+    transcription = await main.transcribe_file(UploadedFile(b"\0" * 32_000))
+    mcp_response = await main.query_mcp_server(transcription, [])
+    await main.text_to_speech(mcp_response["response"]["LLM_response"])
+
+async def per_request_clients():
+    backends = Backends()
+    backends.start(monitor_health=False)
+    main.backends = backends
+    try:
+        await run_pipeline()
+    finally:
+        await backends.close()
+
+async def pooled_clients():
+    await run_pipeline()
+
+async def measure(label: str, fn, num_requests: int):
+    latencies = []
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        await fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<22} mean={statistics.mean(latencies):7.2f}ms  p50={statistics.median(latencies):7.2f}ms  p95={p95:7.2f}ms")
+
+async def main_async(num_requests: int, warmup: int):
+    shutdown_event = asyncio.Event()
+    stubs = asyncio.create_task(run_stub_backends(shutdown_event))
+    await asyncio.sleep(0.5) # Let the stubs bind their ports
+
+    try:
+        for _ in range(warmup):
+            await per_request_clients()
+        await measure("per-request clients", per_request_clients, num_requests)
+
+        pooled = Backends()
+        pooled.start(monitor_health=False)
+        main.backends = pooled
+        for _ in range(warmup):
+            await pooled_clients()
+        await measure("pooled clients", pooled_clients, num_requests)
+        await pooled.close()
+    finally:
+        shutdown_event.set()
+        await stubs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.requests, args.warmup))
@@ -0,0 +1,76 @@
+"""
+Compare text queries that resend the whole history (the old protocol) against
+queries that continue a server-side session, as the conversation grows: bytes
+sent and received by the client and end-to-end latency through the proxy.
+
+Run from the proxy directory:
+    python -m bench.session_benchmark --turns 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from urllib.parse import urlencode
+
+from bench.stub_backends import run_stub_backends, stub_env
+
+os.environ.update(stub_env())
+
+import main # noqa: E402 (must be imported after the stub URLs are set)
+
+REPORT_EVERY = (10, 50, 100, 200, 500)
+
+async def run_conversation(client, turns: int, use_session: bool) -> dict[int, tuple[int, int, float]]:
+    """Returns turn -> (request bytes, response bytes, median latency in ms of the last few turns)"""
+    history, session_id = [], None
+    results, recent = {}, []
+    for turn in range(1, turns + 1):
+        form = {"query": f"Question number {turn}, what is the weather like today?"}
+        if use_session:
+            if session_id:
+                form["session_id"] = session_id
+        else:
+            form["history"] = json.dumps(history)
+        body = urlencode(form).encode()
+
+        start = time.perf_counter()
+        response = await client.post("/proxy/text-query", data=body, headers={"Content-Type": "application/x-www-form-urlencoded"})
+        data = await response.get_data()
+        recent = (recent + [(time.perf_counter() - start) * 1000])[-5:]
+
+        result = json.loads(data)["response"]
+        if use_session:
+            session_id = result["session_id"]
+        else:
+            history = result["history"]
+        if turn in REPORT_EVERY or turn == turns:
+            results[turn] = (len(body), len(data), statistics.median(recent))
+    return results
+
+async def main_async(turns: int):
+    shutdown_event = asyncio.Event()
+    stubs = asyncio.create_task(run_stub_backends(shutdown_event))
+    await asyncio.sleep(0.5) # Let the stubs bind their ports
+
+    try:
+        async with main.app.test_app() as test_app:
+            client = test_app.test_client()
+            stateless = await run_conversation(client, turns, use_session=False)
+            session = await run_conversation(client, turns, use_session=True)
+
+        print(f"{'turn':>5} {'history: sent':>14} {'received':>10} {'latency':>9}   {'session: sent':>14} {'received':>10} {'latency':>9}")
+        for turn in stateless:
+            h_sent, h_received, h_latency = stateless[turn]
+            s_sent, s_received, s_latency = session[turn]
+            print(f"{turn:>5} {h_sent:>14} {h_received:>10} {h_latency:>7.2f}ms   {s_sent:>14} {s_received:>10} {s_latency:>7.2f}ms")
+    finally:
+        shutdown_event.set()
+        await stubs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.turns))
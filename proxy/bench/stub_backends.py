@@ -0,0 +1,171 @@
+"""
+Local stand-ins for the STT, MCP and TTS servers so the proxy can be exercised
+without a GPU, Ollama or network access.
+
+Latencies are seconds or a distribution: "0.2", "uniform:0.1,0.3",
+"lognormal:0.2,0.5" (median, sigma) or "exp:0.2" (mean).
+
+Run standalone (e.g. for bench.load_test or a manually started proxy):
+    python -m bench.stub_backends --mcp-latency lognormal:1.5,0.6 --tts-latency uniform:0.2,0.6
+"""
+import argparse
+import asyncio
+import io
+import math
+import random
+import wave
+from collections import Counter
+from contextlib import asynccontextmanager
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from quart import Quart, jsonify, request, Response
+
+STT_PORT = 15001
+MCP_PORT = 15000
+TTS_PORT = 15008
+
+# Requests each stub stopped handling because the proxy went away (backend name -> count)
+cancelled_requests = Counter()
+
+def latency_sampler(spec: float | str):
+    """Return a function drawing one latency (seconds) from the given distribution spec"""
+    if isinstance(spec, (int, float)):
+        return lambda: spec
+    kind, _, params = spec.partition(":")
+    if not params:
+        value = float(kind)
+        return lambda: value
+    args = [float(arg) for arg in params.split(",")]
+    if kind == "uniform":
+        return lambda: random.uniform(args[0], args[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(args[0]), args[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1 / args[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+def fake_wav(num_bytes: int) -> bytes:
+    """Return a silent 16-bit mono 22.05kHz WAV (piper's format) of roughly num_bytes"""
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(22050)
+        wav.writeframes(bytes(max(num_bytes - 44, 0) // 2 * 2))
+    return output.getvalue()
+
+def create_stt_app(latency: float | str = 0.0, transcription: str = "what is the weather today"):
+    app = Quart("stub_stt")
+    sample_latency = latency_sampler(latency)
+
+    @app.route("/health", methods=["GET"])
+    async def health_check():
+        return jsonify({"status": "healthy"}), 200
+
+    @app.route("/transcribe", methods=["POST"])
+    async def transcribe():
+        await request.files
+        await asyncio.sleep(sample_latency())
+        return jsonify({"transcription": transcription}), 200
+
+    return app
+
+def create_mcp_app(latency: float | str = 0.0, response_text: str = "It is sunny today, sir."):
+    app = Quart("stub_mcp")
+    sample_latency = latency_sampler(latency)
+
+    @app.route("/health", methods=["GET"])
+    async def health_check():
+        return jsonify({"status": "healthy"}), 200
+
+    @app.route("/query", methods=["POST"])
+    async def query():
+        body = await request.get_json()
+        delay = sample_latency()
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled_requests["mcp"] += 1
+            raise
+        history = body.get("history", []) + [
+            {"role": "user", "content": body.get("query")},
+            {"role": "assistant", "content": response_text},
+        ]
+        return jsonify({"response": {
+            "query": body.get("query"),
+            "history": history,
+            "LLM_response": response_text,
+        }}), 200, {"Server-Timing": f"llm;dur={delay * 1000:.1f}, tools;dur=0.0"}
+
+    return app
+
+def create_tts_app(latency: float | str = 0.0, wav_bytes: int = 64_000):
+    app = Quart("stub_tts")
+    wav = fake_wav(wav_bytes)
+    sample_latency = latency_sampler(latency)
+
+    @app.route("/health", methods=["GET"])
+    async def health_check():
+        return jsonify({"status": "healthy"}), 200
+
+    @app.route("/", methods=["GET"])
+    async def synthesize():
+        await asyncio.sleep(sample_latency())
+        return Response(wav, mimetype="audio/wav")
+
+    return app
+
+def fake_response(num_chars: int) -> str:
+    """LLM-like answer of roughly num_chars, in sentences so the proxy splits it for TTS"""
+    sentence = "The weather today is sunny with a light breeze, sir. "
+    return (sentence * (num_chars // len(sentence) + 1))[:num_chars].strip()
+
+async def serve_app(app, port: int, shutdown_event: asyncio.Event):
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    config.errorlog = None
+    await serve(app, config, shutdown_trigger=shutdown_event.wait)
+
+async def run_stub_backends(shutdown_event: asyncio.Event, stt_latency=0.0, mcp_latency=0.0, tts_latency=0.0, wav_bytes=64_000, response_chars=None):
+    """Serve all three stubs until shutdown_event is set"""
+    mcp_app = create_mcp_app(mcp_latency) if response_chars is None else create_mcp_app(mcp_latency, fake_response(response_chars))
+    await asyncio.gather(
+        serve_app(create_stt_app(stt_latency), STT_PORT, shutdown_event),
+        serve_app(mcp_app, MCP_PORT, shutdown_event),
+        serve_app(create_tts_app(tts_latency, wav_bytes), TTS_PORT, shutdown_event),
+    )
+
+@asynccontextmanager
+async def stub_backends(**kwargs):
+    """Serve the stubs (see run_stub_backends for the arguments) for the duration of the block"""
+    shutdown_event = asyncio.Event()
+    stubs = asyncio.create_task(run_stub_backends(shutdown_event, **kwargs))
+    await asyncio.sleep(0.5) # Let the stubs bind their ports
+    try:
+        yield
+    finally:
+        shutdown_event.set()
+        await stubs
+
+def stub_env() -> dict:
+    """Environment variables that point the proxy at the stubs"""
+    return {
+        "JARVIS_STT_URL": f"http://127.0.0.1:{STT_PORT}",
+        "JARVIS_MCP_URL": f"http://127.0.0.1:{MCP_PORT}",
+        "JARVIS_TTS_URL": f"http://127.0.0.1:{TTS_PORT}",
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stt-latency", default="0.0")
+    parser.add_argument("--mcp-latency", default="0.0")
+    parser.add_argument("--tts-latency", default="0.0", help="per sentence")
+    parser.add_argument("--wav-bytes", type=int, default=64_000, help="size of each synthesized sentence")
+    parser.add_argument("--response-chars", type=int, default=None, help="length of the MCP answer")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_stub_backends(asyncio.Event(), args.stt_latency, args.mcp_latency, args.tts_latency, args.wav_bytes, args.response_chars))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+
+import httpx
+
+HEALTH_INTERVAL = float(os.getenv("JARVIS_HEALTH_INTERVAL", "10.0")) # seconds between probes
+HEALTH_TIMEOUT = float(os.getenv("JARVIS_HEALTH_TIMEOUT", "2.0"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("JARVIS_BREAKER_FAILURE_THRESHOLD", "3")) # consecutive failures before opening
+BREAKER_RESET_TIMEOUT = float(os.getenv("JARVIS_BREAKER_RESET_TIMEOUT", "15.0")) # seconds before a trial request is let through
+
+class BackendUnavailable(Exception):
+    """Raised instead of calling a backend whose circuit breaker is open, or when no replica accepts the connection"""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after # seconds until a trial request is let through
+
+class CircuitBreaker:
+    """
+    Fails fast while a backend is known to be down. Opens after BREAKER_FAILURE_THRESHOLD consecutive
+    failures (calls and health probes alike), lets one trial request through after BREAKER_RESET_TIMEOUT,
+    and closes again on the first success.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a trial request through, 0 unless it is open"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    @property
+    def available(self) -> bool:
+        """Whether check() would let a call through"""
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.trial_in_flight)
+
+    def check(self):
+        if not self.available:
+            raise BackendUnavailable(f"{self.name} is unavailable", retry_after=self.retry_after)
+        if self.state == "half-open":
+            self.trial_in_flight = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self):
+        """Wrap one backend call: fail fast when open and record the outcome"""
+        self.check()
+        try:
+            yield
+        except httpx.TransportError:
+            self.record_failure()
+            raise
+        except httpx.HTTPStatusError as e:
+            if e.response.is_server_error:
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            # Not the backend's fault (e.g. cancellation), so just release the trial slot
+            self.trial_in_flight = False
+            raise
+        self.record_success()
+
+class HealthMonitor:
+    """Periodically probes each backend's health endpoint and caches the results"""
+
+    def __init__(self, targets: dict[str, str], breakers: dict[str, CircuitBreaker], interval: float = HEALTH_INTERVAL):
+        self.targets = targets # backend name -> health URL
+        self.breakers = breakers
+        self.interval = interval
+        self.results: dict[str, dict] = {name: {"healthy": None} for name in targets}
+        self.client: httpx.AsyncClient | None = None
+        self.task: asyncio.Task | None = None
+
+    async def probe(self, name: str, url: str):
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(url)
+            response.raise_for_status()
+            healthy, error = True, None
+        except httpx.HTTPError as e:
+            healthy, error = False, str(e) or type(e).__name__
+        self.results[name] = {
+            "healthy": healthy,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "checked_at": time.time(),
+            "error": error,
+        }
+        breaker = self.breakers[name]
+        if healthy:
+            breaker.record_success()
+        else:
+            # One slow probe (e.g. a backend busy with a long request) must not take the replica out of rotation
+            breaker.record_failure()
+
+    async def probe_all(self):
+        await asyncio.gather(*(self.probe(name, url) for name, url in self.targets.items()))
+
+    async def run(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.client = httpx.AsyncClient(timeout=HEALTH_TIMEOUT)
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def snapshot(self) -> dict:
+        return {
+            name: {**result, "breaker": self.breakers[name].state}
+            for name, result in self.results.items()
+        }
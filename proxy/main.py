@@ -1,25 +1,69 @@
-from quart import Quart, request, jsonify
+from quart import Quart, request, jsonify, Response, websocket, g
 from quart_cors import cors
+from werkzeug.datastructures import FileStorage
 
+import asyncio
 import base64
-
-from urllib.parse import quote
+import hashlib
+import io
+import os
+from contextlib import aclosing
 
 import json
-import httpx
+import time
+
+from admission import AdmissionRejected, PRIORITIES, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, DEFAULT_DEADLINE, request_budget, set_request_budget
+from audio_store import AudioStore
+from backends import Backends
+from health import BackendUnavailable
+from metrics import metrics, StageTimings
+from session_store import SessionStore, SessionNotFound, validate_history
+from singleflight import SingleFlight
+from utils import split_sentences, concat_wavs, InMemoryRequest
+
+MAX_UTTERANCE_BYTES = 10 * 1024 * 1024
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+TTS_SENTENCE_CONCURRENCY = int(os.getenv("JARVIS_TTS_SENTENCE_CONCURRENCY", "4")) # sentences of one answer queued or synthesized at once
 
 app = Quart(__name__)
+app.request_class = InMemoryRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
 app = cors(app, allow_origin="*") # TODO: change later
 
-async def transcribe_file(audio_file):
-    speech_to_text_url = "http://localhost:5001/transcribe"
+backends = Backends()
+audio_store = AudioStore()
+session_store = SessionStore()
+text_queries = SingleFlight("mcp")
+
+@app.before_serving
+async def startup():
+    """Open the pooled backend connections before serving requests"""
+    backends.start()
+    await asyncio.to_thread(session_store.prune_files)
+
+@app.after_serving
+async def shutdown():
+    """Close the pooled backend connections"""
+    await backends.close()
+
+@app.after_request
+async def add_server_timing(response):
+    """Report the stages timed during this request as a Server-Timing header"""
+    timings = g.get("timings")
+    if timings is not None and timings.durations:
+        response.headers["Server-Timing"] = timings.header()
+    return response
 
+async def transcribe_file(audio_file):
+    # Read the upload into memory so a hedged or retried call can send it again
     files = {
-        "file": (audio_file.filename, audio_file.stream, audio_file.content_type)
+        "file": (audio_file.filename, audio_file.stream.read(), audio_file.content_type)
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(speech_to_text_url, files=files)
+    backends.stt.check()
+    async with backends.queues["stt"].slot():
+        with metrics.backend_call("stt"):
+            response = await backends.stt.post("/transcribe", files=files, hedge=True)
 
     data = response.json()
     transcription = data.get("transcription")
@@ -31,110 +75,517 @@ async def transcribe_file(audio_file):
     
     return transcription
     
-async def query_mcp_server(query: str, history: list):
-    mcp_url = "http://127.0.0.1:5000/query"
-
+async def call_mcp_server(query: str, history: list) -> tuple[dict, str | None]:
+    """The MCP response and its Server-Timing header (the MCP stage split into LLM and tool time)"""
     payload = {
         "query": query,
         "history": history
     }
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(mcp_url, json=payload)
+    backends.mcp.check()
+    async with backends.queues["mcp"].slot():
+        with metrics.backend_call("mcp"):
+            response = await backends.mcp.post("/query", json=payload)
 
-    data = response.json()
+    return response.json(), response.headers.get("Server-Timing")
+
+async def query_mcp_server(query: str, history: list, timings: StageTimings = None):
+    data, server_timing = await call_mcp_server(query, history)
+    if timings is not None:
+        timings.record_server_timing(server_timing, "mcp")
     return data
 
-async def text_to_speech(text: str):
+def query_key(query: str, history: list) -> str:
+    """Same question (ignoring case, spacing and trailing punctuation) in the same conversation state"""
+    normalized = " ".join((query or "").lower().split()).rstrip("?.! ")
+    fingerprint = hashlib.sha256(json.dumps(history, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+    return f"{fingerprint}:{normalized}"
+
+async def query_mcp_shared(query: str, history: list, timings: StageTimings = None, cacheable: bool = False):
+    """
+    query_mcp_server, but identical queries in flight at the same time share one MCP call (one agent
+    loop, one set of tool calls). Cacheable answers are also reused for JARVIS_RESULT_CACHE_TTL seconds.
+    Every caller records the shared call's LLM and tool timings; for a cached answer they are those of
+    the call that produced it.
+    """
+    data, server_timing = await text_queries.run(query_key(query, history), lambda: call_mcp_server(query, history), cacheable)
+    if timings is not None:
+        timings.record_server_timing(server_timing, "mcp")
+    return data
+
+async def synthesize_speech(text: str, admitted: bool = False) -> bytes:
     if not text:
         raise Exception("TTS error: text is empty")
     
-    encoded_text = quote(text)
-    text_to_speech_url = f"http://localhost:5008/?text={encoded_text}"
+    # The TTS queue is shared by all requests so the TTS server is never oversubscribed
+    backends.tts.check()
+    async with backends.queues["tts"].slot(admitted):
+        with metrics.backend_call("tts"):
+            wav = await backends.tts.get("/", params={"text": text}, hedge=True)
+    wav.raise_for_status()
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        wav = await client.get(text_to_speech_url)
+    return wav.content
 
-    wav_bytes = wav.content
+async def text_to_speech(text: str):
+    wav_bytes = await synthesize_speech(text)
 
     encoded_wav = base64.b64encode(wav_bytes).decode("utf-8")
 
     return encoded_wav
 
+async def synthesize_sentences(text: str):
+    """
+    Split text into sentences, synthesize them concurrently and yield (sentence, wav_bytes) in order.
+    Each sentence is yielded as soon as it and every earlier sentence are ready.
+    """
+    sentences = split_sentences(text or "")
+    if not sentences:
+        raise Exception("TTS error: text is empty")
+
+    # The answer is admitted to the TTS queue once, so a long one cannot be rejected halfway through.
+    # At most TTS_SENTENCE_CONCURRENCY of its sentences wait in the queue at a time, leaving room for other requests.
+    backends.tts.check()
+    backends.queues["tts"].admit(request_budget.get()[0])
+    window = asyncio.Semaphore(TTS_SENTENCE_CONCURRENCY)
+
+    async def synthesize(sentence: str) -> bytes:
+        async with window:
+            return await synthesize_speech(sentence, admitted=True)
+
+    tasks = [asyncio.create_task(synthesize(sentence)) for sentence in sentences]
+    try:
+        for sentence, task in zip(sentences, tasks):
+            yield sentence, await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def package_audio(wav_bytes: bytes, audio_transport: str) -> dict:
+    """
+    Package synthesized audio for a JSON response. "base64" embeds the WAV as tts_wav,
+    "url" stores it and returns a short-lived tts_audio_url the client fetches as binary.
+    """
+    if audio_transport == "url":
+        audio_id = audio_store.put(wav_bytes, "audio/wav")
+        return {"tts_audio_url": f"/proxy/audio/{audio_id}"}
+    return {"tts_wav": base64.b64encode(wav_bytes).decode("utf-8")}
+
+def apply_request_budget(form, default_priority: int):
+    """
+    Set the priority and deadline used by the backend admission queues for this request.
+    Clients may override them with the "priority" (interactive/normal/background) and
+    "deadline" (seconds) form fields.
+    """
+    priority = PRIORITIES.get(form.get("priority", ""), default_priority)
+    try:
+        deadline = float(form.get("deadline", DEFAULT_DEADLINE))
+    except ValueError:
+        deadline = DEFAULT_DEADLINE
+    set_request_budget(priority, deadline)
+
+def rejection_response(error: AdmissionRejected | BackendUnavailable):
+    headers = {}
+    if error.retry_after is not None:
+        headers["Retry-After"] = str(max(1, round(error.retry_after)))
+    return jsonify({"error": str(error)}), error.status_code, headers
+
+async def load_conversation(form):
+    """
+    Find the history a query continues. With "session_id" it is the stored session, so the client
+    only sends the new turn; otherwise it is the "history" form field as before. A request with
+    neither starts a new session. Returns (history, session), session is None for the stateless form.
+    """
+    session_id = form.get("session_id")
+    if session_id:
+        session = await session_store.get(session_id)
+        if session is None:
+            raise SessionNotFound("Session not found or expired")
+        return session.history, session
+
+    history_str = form.get("history")
+    if history_str is None:
+        session = session_store.create()
+        return session.history, session
+
+    try:
+        history = json.loads(history_str)
+    except json.JSONDecodeError:
+        raise ValueError("Invalid JSON in history")
+    if not isinstance(history, list):
+        raise ValueError("History is not an array")
+    return history, None
+
+async def query_conversation(query: str, history: list, session, timings: StageTimings = None, shared: bool = False, cacheable: bool = False):
+    """
+    Query the MCP server. For a stored session the new history is kept server-side and the
+    response carries the session_id instead of the full history. With shared, identical
+    concurrent queries are coalesced (see query_mcp_shared).
+    """
+    async def ask(history: list):
+        if shared:
+            return await query_mcp_shared(query, history, timings, cacheable)
+        return await query_mcp_server(query, history, timings)
+
+    if session is None:
+        return await ask(history)
+
+    async with session.lock:
+        mcp_response = await ask(session.history)
+        response = mcp_response.get("response")
+        if response:
+            session.history = response.pop("history", session.history)
+            await session_store.save(session)
+            response["session_id"] = session.id
+    return mcp_response
+
 @app.route("/proxy/health", methods=["GET"])
 async def health_check():
-    """Health check endpoint"""
-    return jsonify({"status": "healthy"}), 200
+    """
+    Health check endpoint. Reports the cached result of the background backend probes:
+    "healthy" when every backend is up, "degraded" when text queries still work (MCP is up)
+    but STT or TTS is down, and "unhealthy" when MCP is down.
+    """
+    backend_health = backends.health()
+    # Backends that have not been probed yet are assumed up
+    down = [name for name, result in backend_health.items() if result["healthy"] is False]
+    if "mcp" in down:
+        status, status_code = "unhealthy", 503
+    elif down:
+        status, status_code = "degraded", 200
+    else:
+        status, status_code = "healthy", 200
+    return jsonify({"status": status, "backends": backend_health}), status_code
+
+@app.route("/proxy/metrics", methods=["GET"])
+async def metrics_endpoint():
+    """Prometheus-style metrics: stage and backend latency histograms, in-flight and error counts"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/proxy/audio/<audio_id>", methods=["GET"])
+async def get_audio(audio_id: str):
+    """Serve audio stored by an audio_transport=url query until it expires"""
+    item = audio_store.get(audio_id)
+    if item is None:
+        return jsonify({"error": "Audio not found or expired"}), 404
+    data, mimetype = item
+    return Response(data, mimetype=mimetype)
+
+@app.route("/proxy/sessions", methods=["POST"])
+async def create_session():
+    """Start a server-side conversation, optionally seeded with an existing history"""
+    form = await request.form
+    try:
+        history = validate_history(json.loads(form.get("history", "[]")))
+    except json.JSONDecodeError:
+        return jsonify({"error": "Invalid JSON in history"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    session = session_store.create(history)
+    await session_store.save(session)
+    return jsonify({"session_id": session.id}), 201
+
+@app.route("/proxy/sessions/<session_id>", methods=["GET"])
+async def get_session(session_id: str):
+    """Full history of a session, e.g. to render a conversation after a reload"""
+    session = await session_store.get(session_id)
+    if session is None:
+        return jsonify({"error": "Session not found or expired"}), 404
+    return jsonify({"session_id": session.id, "history": session.history}), 200
+
+@app.route("/proxy/sessions/<session_id>", methods=["DELETE"])
+async def delete_session(session_id: str):
+    await session_store.delete(session_id)
+    return "", 204
 
 @app.route("/proxy/audio-query", methods=["POST"])
 async def audio_query():
     """
-    Audio query endpoint. Takes in an audio blob and history, gets transcription from STT server, 
+    Audio query endpoint. Takes in an audio blob and history (or a session_id), gets transcription from STT server, 
     gets the MCP server's response, and returns audio blob and MCP JSON response.
+    Set audio_transport=url to get a tts_audio_url to fetch instead of a base64 tts_wav.
     """
-    files = await request.files
-    form = await request.form
+    timings = g.timings = StageTimings()
+    with timings.stage("upload"):
+        files = await request.files
+        form = await request.form
 
     audio_file = files.get("file")
-    history_str = form.get("history")
 
     use_tts = False
     if form.get("use_tts").lower() == "true":
         use_tts = True
+    audio_transport = form.get("audio_transport", "base64")
+    apply_request_budget(form, PRIORITY_INTERACTIVE)
 
-    if not audio_file or not history_str:
-        return jsonify({"error": "Missing audio file or history"}), 400
+    if not audio_file:
+        return jsonify({"error": "Missing audio file"}), 400
 
     try:
-        history = json.loads(history_str)
-        if not isinstance(history, list):
-            raise ValueError("History is not an array")
-    except json.JSONDecodeError:
-        return jsonify({"error": "Invalid JSON in history"}), 400
+        history, session = await load_conversation(form)
+    except SessionNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     mcp_response = None
     try:
-        transcription = await transcribe_file(audio_file)
-        mcp_response = await query_mcp_server(transcription, history)
+        with timings.stage("stt"):
+            transcription = await transcribe_file(audio_file)
+        with timings.stage("mcp"):
+            mcp_response = await query_conversation(transcription, history, session, timings)
         if not use_tts:
             return jsonify(mcp_response), 200
+    except (AdmissionRejected, BackendUnavailable) as e:
+        return rejection_response(e)
     except Exception as e:
-        return jsonify({"error": e}), 500
+        return jsonify({"error": str(e)}), 500
     
     try:
-        wav = await text_to_speech(mcp_response.get("response").get("LLM_response"))
+        with timings.stage("tts"):
+            async with aclosing(synthesize_sentences(mcp_response.get("response").get("LLM_response"))) as chunks:
+                wavs = [wav async for _, wav in chunks]
+            wav_bytes = concat_wavs(wavs)
         full_response = mcp_response
-        full_response.get("response")["tts_wav"] = wav
+        full_response.get("response").update(package_audio(wav_bytes, audio_transport))
         return jsonify(full_response), 200
     except Exception as e:
         # Even if stt fails, we should still return the mcp response
         return jsonify(mcp_response), 200
 
+def ndjson_event(event_type: str, **fields) -> bytes:
+    return (json.dumps({"type": event_type, **fields}) + "\n").encode("utf-8")
+
+@app.route("/proxy/audio-query/stream", methods=["POST"])
+async def audio_query_stream():
+    """
+    Streaming audio query endpoint. Same inputs as /proxy/audio-query, but returns newline-delimited
+    JSON events as each stage finishes: "transcription", then "response", then one "audio" event per
+    sentence in playback order (if use_tts), and finally "done" with the stage timings in milliseconds.
+    A failing stage emits an "error" event instead.
+    """
+    timings = g.timings = StageTimings()
+    with timings.stage("upload"):
+        files = await request.files
+        form = await request.form
+
+    audio_file = files.get("file")
+    use_tts = (form.get("use_tts") or "").lower() == "true"
+    audio_transport = form.get("audio_transport", "base64")
+    apply_request_budget(form, PRIORITY_INTERACTIVE)
+    budget = request_budget.get()
+
+    if not audio_file:
+        return jsonify({"error": "Missing audio file"}), 400
+
+    try:
+        history, session = await load_conversation(form)
+    except SessionNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # The upload is closed once the handler returns, so buffer it for the generator
+    audio_file = FileStorage(io.BytesIO(audio_file.read()), filename=audio_file.filename, content_type=audio_file.content_type)
+
+    async def events():
+        # The body may be iterated outside the handler's context, so carry the budget over explicitly
+        request_budget.set(budget)
+        try:
+            with timings.stage("stt"):
+                transcription = await transcribe_file(audio_file)
+            yield ndjson_event("transcription", transcription=transcription)
+
+            with timings.stage("mcp"):
+                mcp_response = await query_conversation(transcription, history, session, timings)
+            yield ndjson_event("response", response=mcp_response.get("response"))
+        except (AdmissionRejected, BackendUnavailable) as e:
+            yield ndjson_event("error", error=str(e), status=e.status_code, retry_after=e.retry_after)
+            return
+        except Exception as e:
+            yield ndjson_event("error", error=str(e))
+            return
+
+        if use_tts:
+            try:
+                index = 0
+                start = time.perf_counter()
+                async with aclosing(synthesize_sentences(mcp_response.get("response").get("LLM_response"))) as chunks:
+                    async for sentence, wav_bytes in chunks:
+                        if index == 0:
+                            timings.record("tts-first", time.perf_counter() - start)
+                        yield ndjson_event("audio", index=index, text=sentence, **package_audio(wav_bytes, audio_transport))
+                        index += 1
+                timings.record("tts", time.perf_counter() - start)
+            except Exception as e:
+                # The text response was already delivered, so a TTS failure is not fatal
+                yield ndjson_event("error", error=f"TTS error: {e}")
+        yield ndjson_event("done", timings=timings.as_dict())
+
+    return events(), 200, {"Content-Type": "application/x-ndjson"}
+
 @app.route("/proxy/text-query", methods=["POST"])
 async def text_query():
     """
-    Text query endpoint. Takes in query and history, forwards request to mcp server, and returns the result.
+    Text query endpoint. Takes in query and history (or a session_id), forwards request to mcp server, and returns the result.
+    Identical queries already in flight are answered by the same MCP call. Set cacheable=true for
+    answers that are not time-sensitive to also reuse a recent identical answer.
     """
-    form = await request.form
+    timings = g.timings = StageTimings()
+    with timings.stage("upload"):
+        form = await request.form
 
     query = form.get("query")
-    history_str = form.get("history")
-
-    if not history_str:
-        return jsonify({"error": "Missing history"}), 400
+    cacheable = (form.get("cacheable") or "").lower() == "true"
+    apply_request_budget(form, PRIORITY_NORMAL)
 
     try:
-        history = json.loads(history_str)
-        if not isinstance(history, list):
-            raise ValueError("History is not an array")
-    except json.JSONDecodeError:
-        return jsonify({"error": "Invalid JSON in history"}), 400    
+        history, session = await load_conversation(form)
+    except SessionNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        data = await query_mcp_server(query, history)
+        with timings.stage("mcp"):
+            data = await query_conversation(query, history, session, timings, shared=True, cacheable=cacheable)
         return jsonify(data), 200
+    except (AdmissionRejected, BackendUnavailable) as e:
+        return rejection_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+async def run_session_turn(send, turn: int, state: dict, audio_file=None, query: str = None):
+    """Run one STT -> MCP -> TTS turn of a websocket session, pushing each result as it is ready"""
+    timings = StageTimings()
+    set_request_budget(PRIORITY_INTERACTIVE)
+    try:
+        if audio_file is not None:
+            with timings.stage("stt"):
+                query = await transcribe_file(audio_file)
+            await send("transcription", turn, transcription=query)
+
+        with timings.stage("mcp"):
+            mcp_response = await query_conversation(query, state["history"], state["session"], timings)
+        response = mcp_response.get("response")
+        if not response:
+            raise Exception(mcp_response.get("error", "MCP error: empty response"))
+        state["history"] = response.get("history", state["history"])
+        await send("response", turn, response=response)
+
+        if state["use_tts"]:
+            index = 0
+            start = time.perf_counter()
+            async with aclosing(synthesize_sentences(response.get("LLM_response"))) as chunks:
+                async for sentence, wav_bytes in chunks:
+                    if index == 0:
+                        timings.record("tts-first", time.perf_counter() - start)
+                    await send("audio", turn, index=index, text=sentence, **package_audio(wav_bytes, state["audio_transport"]))
+                    index += 1
+            timings.record("tts", time.perf_counter() - start)
+        await send("done", turn, timings=timings.as_dict())
+    except asyncio.CancelledError:
+        raise
+    except (AdmissionRejected, BackendUnavailable) as e:
+        await send("error", turn, error=str(e), status=e.status_code, retry_after=e.retry_after)
     except Exception as e:
-        return jsonify({"error": e}), 500
+        await send("error", turn, error=str(e))
+
+@app.websocket("/proxy/session")
+async def session_socket():
+    """
+    Full-duplex voice session. The client streams the current utterance as binary frames and
+    drives the session with JSON control messages:
+        {"type": "config", "history": [...] | "session_id": "...", "use_tts": true, "audio_transport": "base64" | "url"}
+        {"type": "speech_start"}                  barge-in: cancel the answer in progress
+        {"type": "utterance_end", "content_type": "audio/wav"}    answer the buffered audio
+        {"type": "text", "query": "..."}          answer a typed query
+        {"type": "cancel"}                        cancel the answer in progress
+    The server pushes "transcription", "response", "audio" (one per sentence), "done", "error"
+    and "cancelled" events, each tagged with the turn number they belong to.
+    """
+    ws = websocket._get_current_object()
+    state = {"history": [], "session": None, "use_tts": False, "audio_transport": "base64"}
+    audio_buffer = bytearray()
+    turn = 0
+    current = None
+
+    async def send(event_type: str, turn: int = None, **fields):
+        await ws.send(json.dumps({"type": event_type, "turn": turn, **fields}))
+
+    async def cancel_current():
+        # Cancelling the task aborts its in-flight STT, MCP and TTS requests
+        if current is not None and not current.done():
+            current.cancel()
+            await asyncio.gather(current, return_exceptions=True)
+            await send("cancelled", turn)
+
+    def start_turn(**kwargs):
+        nonlocal turn, current
+        turn += 1
+        current = asyncio.create_task(run_session_turn(send, turn, state, **kwargs))
+
+    try:
+        while True:
+            message = await ws.receive()
+            if isinstance(message, bytes):
+                if len(audio_buffer) + len(message) > MAX_UTTERANCE_BYTES:
+                    audio_buffer.clear()
+                    await send("error", turn, error="Utterance too large")
+                    continue
+                audio_buffer.extend(message)
+                continue
+
+            try:
+                control = json.loads(message)
+            except json.JSONDecodeError:
+                await send("error", turn, error="Invalid JSON control message")
+                continue
+
+            message_type = control.get("type")
+            if message_type == "config":
+                history = control.get("history", state["history"])
+                if not isinstance(history, list):
+                    await send("error", turn, error="History is not an array")
+                    continue
+                state["history"] = history
+                if control.get("session_id"):
+                    # Continue a stored conversation, its history stays server-side
+                    session = await session_store.get(control["session_id"])
+                    if session is None:
+                        await send("error", turn, error="Session not found or expired")
+                        continue
+                    state["session"] = session
+                state["use_tts"] = bool(control.get("use_tts", state["use_tts"]))
+                state["audio_transport"] = control.get("audio_transport", state["audio_transport"])
+            elif message_type == "speech_start":
+                await cancel_current()
+                audio_buffer.clear()
+            elif message_type == "utterance_end":
+                await cancel_current()
+                if not audio_buffer:
+                    await send("error", turn, error="No audio received for utterance")
+                    continue
+                content_type = control.get("content_type", "audio/wav")
+                audio_file = FileStorage(io.BytesIO(bytes(audio_buffer)), filename="utterance", content_type=content_type)
+                audio_buffer.clear()
+                start_turn(audio_file=audio_file)
+            elif message_type == "text":
+                await cancel_current()
+                query = control.get("query")
+                if not query or not isinstance(query, str):
+                    await send("error", turn, error="Invalid query")
+                    continue
+                start_turn(query=query)
+            elif message_type == "cancel":
+                await cancel_current()
+            else:
+                await send("error", turn, error=f"Unknown message type: {message_type}")
+    finally:
+        # Client disconnected, stop spending backend time on this session
+        if current is not None and not current.done():
+            current.cancel()
+            await asyncio.gather(current, return_exceptions=True)
 
 if __name__ == "__main__":
     app.run(use_reloader=False, debug=True, port=5002) # TODO: change
\ No newline at end of file
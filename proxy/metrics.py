@@ -0,0 +1,138 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds (seconds), sized for voice pipeline stages
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class Histogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+class Metrics:
+    """Process-wide gateway metrics, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.stage_latency: dict[str, Histogram] = defaultdict(Histogram)
+        self.backend_latency: dict[str, Histogram] = defaultdict(Histogram)
+        self.backend_in_flight: dict[str, int] = defaultdict(int)
+        self.backend_requests: dict[str, int] = defaultdict(int)
+        self.backend_errors: dict[str, int] = defaultdict(int)
+        self.queue_waiting: dict[str, int] = defaultdict(int)
+        self.queue_rejections: dict[str, int] = defaultdict(int)
+        self.replica_in_flight: dict[str, int] = defaultdict(int) # keyed by "<backend> <url>"
+        self.replica_requests: dict[str, int] = defaultdict(int)
+        self.hedged_requests: dict[str, int] = defaultdict(int)
+        self.hedge_wins: dict[str, int] = defaultdict(int)
+        self.coalesced_requests: dict[str, int] = defaultdict(int)
+        self.result_cache_hits: dict[str, int] = defaultdict(int)
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.stage_latency[stage].observe(seconds)
+
+    @contextmanager
+    def backend_call(self, backend: str):
+        """Track one call to a backend: in-flight count, latency and errors"""
+        self.backend_in_flight[backend] += 1
+        self.backend_requests[backend] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.backend_errors[backend] += 1
+            raise
+        finally:
+            self.backend_in_flight[backend] -= 1
+            self.backend_latency[backend].observe(time.perf_counter() - start)
+
+    def render(self) -> str:
+        lines = []
+
+        def histogram(name: str, help_text: str, label: str, histograms: dict[str, Histogram]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(histograms.items()):
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{label}="{key}",le="+Inf"}} {hist.count}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {hist.sum}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {hist.count}')
+
+        def simple(name: str, help_text: str, metric_type: str, values: dict[str, int]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{{backend="{key}"}} {value}')
+
+        def per_replica(name: str, help_text: str, metric_type: str, values: dict[str, int]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key, value in sorted(values.items()):
+                backend, _, url = key.partition(" ")
+                lines.append(f'{name}{{backend="{backend}",replica="{url}"}} {value}')
+
+        histogram("jarvis_proxy_stage_duration_seconds", "Time spent in each request stage.", "stage", self.stage_latency)
+        histogram("jarvis_proxy_backend_duration_seconds", "Latency of calls to each backend.", "backend", self.backend_latency)
+        simple("jarvis_proxy_backend_in_flight", "Backend calls currently in flight.", "gauge", self.backend_in_flight)
+        simple("jarvis_proxy_backend_requests_total", "Calls made to each backend.", "counter", self.backend_requests)
+        simple("jarvis_proxy_backend_errors_total", "Failed calls to each backend.", "counter", self.backend_errors)
+        simple("jarvis_proxy_queue_waiting", "Requests waiting for a backend slot.", "gauge", self.queue_waiting)
+        simple("jarvis_proxy_queue_rejections_total", "Requests rejected by admission control.", "counter", self.queue_rejections)
+        per_replica("jarvis_proxy_replica_in_flight", "Calls currently in flight to each replica.", "gauge", self.replica_in_flight)
+        per_replica("jarvis_proxy_replica_requests_total", "Calls sent to each replica, including hedges.", "counter", self.replica_requests)
+        simple("jarvis_proxy_hedged_requests_total", "Calls repeated on a second replica.", "counter", self.hedged_requests)
+        simple("jarvis_proxy_hedge_wins_total", "Hedged calls answered first by the second replica.", "counter", self.hedge_wins)
+        simple("jarvis_proxy_coalesced_requests_total", "Queries attached to an identical query already in flight.", "counter", self.coalesced_requests)
+        simple("jarvis_proxy_result_cache_hits_total", "Queries answered from the result cache.", "counter", self.result_cache_hits)
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class StageTimings:
+    """Per-request stage durations, reported as a Server-Timing header and recorded in the metrics"""
+
+    def __init__(self):
+        self.durations: dict[str, float] = {} # stage -> seconds
+
+    def record(self, stage: str, seconds: float):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+        metrics.observe_stage(stage, seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record_server_timing(self, header: str | None, prefix: str):
+        """Merge a backend's own Server-Timing header (e.g. the MCP proxy's llm/tools split)"""
+        if not header:
+            return
+        for entry in header.split(","):
+            name, _, params = entry.strip().partition(";")
+            for param in params.split(";"):
+                key, _, value = param.strip().partition("=")
+                if key == "dur" and name:
+                    try:
+                        self.record(f"{prefix}-{name}", float(value) / 1000)
+                    except ValueError:
+                        pass
+
+    def as_dict(self) -> dict[str, float]:
+        """Durations in milliseconds"""
+        return {stage: round(seconds * 1000, 1) for stage, seconds in self.durations.items()}
+
+    def header(self) -> str:
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.as_dict().items())
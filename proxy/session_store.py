@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+
+from utils import evict_expired
+
+SESSION_TTL = float(os.getenv("JARVIS_SESSION_TTL", "3600.0")) # seconds since the last turn
+SESSION_MAX_ITEMS = int(os.getenv("JARVIS_SESSION_MAX_ITEMS", "1024")) # sessions kept in memory
+SESSION_DIR = os.getenv("JARVIS_SESSION_DIR") # when set, sessions are also persisted here as JSON files
+
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+class SessionNotFound(Exception):
+    pass
+
+def validate_history(history) -> list:
+    """Check a client-supplied history once, when it enters the store"""
+    if not isinstance(history, list):
+        raise ValueError("History is not an array")
+    for item in history:
+        if not isinstance(item, dict) or "role" not in item or "content" not in item:
+            raise ValueError("Invalid history item format")
+    return history
+
+class Session:
+    def __init__(self, session_id: str, history: list | None = None):
+        self.id = session_id
+        self.history = history or []
+        # Turns of one conversation run one at a time, so none of them is lost
+        self.lock = asyncio.Lock()
+
+class SessionStore:
+    """
+    Conversation histories kept server-side, so clients only send the new turn. Least recently used
+    sessions are evicted from memory once over max_items and expire after ttl seconds without a turn.
+    With a directory, sessions are written to disk after every turn and survive eviction and restarts.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, max_items: int = SESSION_MAX_ITEMS, directory: str | None = SESSION_DIR):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.directory = directory
+        self.sessions: OrderedDict[str, tuple[float, Session]] = OrderedDict() # id -> (expires_at, session), least recently used first
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def touch(self, session: Session):
+        self.sessions[session.id] = (time.monotonic() + self.ttl, session)
+        self.sessions.move_to_end(session.id)
+        evict_expired(self.sessions, self.max_items)
+
+    def create(self, history: list | None = None) -> Session:
+        session = Session(uuid.uuid4().hex, history)
+        self.touch(session)
+        return session
+
+    def read_file(self, session_id: str) -> list | None:
+        path = self.path(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_file(self, session_id: str, history: list):
+        path = self.path(session_id)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(history, f)
+        os.replace(f"{path}.tmp", path)
+
+    async def get(self, session_id: str) -> Session | None:
+        if not SESSION_ID_PATTERN.match(session_id or ""):
+            return None
+        evict_expired(self.sessions, self.max_items)
+        item = self.sessions.get(session_id)
+        if item is not None:
+            session = item[1]
+        elif self.directory:
+            history = await asyncio.to_thread(self.read_file, session_id)
+            if history is None:
+                return None
+            # Another request may have loaded it while the file was being read
+            item = self.sessions.get(session_id)
+            session = item[1] if item is not None else Session(session_id, history)
+        else:
+            return None
+        self.touch(session)
+        return session
+
+    async def save(self, session: Session):
+        """Record a finished turn: refresh the session's expiry and persist it"""
+        self.touch(session)
+        if self.directory:
+            await asyncio.to_thread(self.write_file, session.id, session.history)
+
+    async def delete(self, session_id: str):
+        if not SESSION_ID_PATTERN.match(session_id or ""):
+            return
+        self.sessions.pop(session_id, None)
+        if self.directory:
+            try:
+                await asyncio.to_thread(os.remove, self.path(session_id))
+            except FileNotFoundError:
+                pass
+
+    def prune_files(self):
+        """Delete persisted sessions that expired while the proxy was down"""
+        if not self.directory:
+            return
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".json") and now - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
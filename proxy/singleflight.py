@@ -0,0 +1,61 @@
+import asyncio
+import copy
+import os
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+from utils import evict_expired
+
+RESULT_CACHE_TTL = float(os.getenv("JARVIS_RESULT_CACHE_TTL", "30.0")) # seconds, 0 disables the result cache
+RESULT_CACHE_MAX_ITEMS = int(os.getenv("JARVIS_RESULT_CACHE_MAX_ITEMS", "256"))
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time: callers asking for a key that is already in
+    flight wait for that computation instead of starting their own. Results of cacheable calls are
+    also kept for ttl seconds. Every caller gets its own copy of the result.
+    """
+
+    def __init__(self, name: str, ttl: float = RESULT_CACHE_TTL, max_items: int = RESULT_CACHE_MAX_ITEMS):
+        self.name = name
+        self.ttl = ttl
+        self.max_items = max_items
+        self.in_flight: dict[str, tuple[asyncio.Task, list[int]]] = {} # key -> (task, [waiter count])
+        self.results: OrderedDict[str, tuple[float, object]] = OrderedDict() # key -> (expires_at, result)
+
+    def forget(self, key: str, task: asyncio.Task):
+        if key in self.in_flight and self.in_flight[key][0] is task:
+            del self.in_flight[key]
+
+    async def run(self, key: str, fn, cacheable: bool = False):
+        """Return fn()'s result, shared with every concurrent caller of the same key"""
+        evict_expired(self.results, self.max_items)
+        if cacheable and key in self.results:
+            metrics.result_cache_hits[self.name] += 1
+            return copy.deepcopy(self.results[key][1])
+
+        if key in self.in_flight:
+            task, waiters = self.in_flight[key]
+            metrics.coalesced_requests[self.name] += 1
+        else:
+            task, waiters = asyncio.create_task(fn()), [0]
+            self.in_flight[key] = (task, waiters)
+            task.add_done_callback(lambda _: self.forget(key, task))
+
+        waiters[0] += 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Only stop the computation once nobody is waiting for it any more
+            if waiters[0] == 1 and not task.done():
+                task.cancel()
+                self.forget(key, task)
+            raise
+        finally:
+            waiters[0] -= 1
+
+        if cacheable and self.ttl > 0:
+            self.results[key] = (time.monotonic() + self.ttl, result)
+            evict_expired(self.results, self.max_items)
+        return copy.deepcopy(result)
@@ -0,0 +1,38 @@
+import os
+import sys
+
+# Tests import the modules of this directory the way main.py does
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from bench.stub_backends import stub_env # noqa: E402
+
+# Backend URLs are read when backends.py is imported, so point them at the stubs first
+os.environ.update(stub_env())
+
+from contextlib import asynccontextmanager # noqa: E402
+
+import pytest # noqa: E402
+
+@pytest.fixture
+def proxy_backends():
+    """
+    Async context manager that gives main a fresh Backends (without health probes) for the block.
+    The module's own Backends is put back after the test, so no state carries over to the next one.
+    """
+    import main
+    from backends import Backends
+
+    saved = main.backends
+
+    @asynccontextmanager
+    async def started():
+        main.backends = backends = Backends()
+        backends.start(monitor_health=False)
+        try:
+            yield backends
+        finally:
+            await backends.close()
+
+    yield started
+    main.backends = saved
@@ -0,0 +1,30 @@
+import asyncio
+
+import main
+from bench.stub_backends import cancelled_requests, stub_backends
+
+async def wait_until(condition, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met in time")
+
+def test_cancelled_query_frees_backend_slots(proxy_backends):
+    async def scenario():
+        async with stub_backends(mcp_latency=30.0), proxy_backends() as backends:
+            queue = backends.queues["mcp"]
+            replica = backends.mcp.replicas[0]
+            cancelled_before = cancelled_requests["mcp"]
+            query = asyncio.create_task(main.query_conversation("what is the weather today", [], None))
+            await wait_until(lambda: queue.active == 1 and replica.outstanding == 1)
+
+            query.cancel()
+            await asyncio.gather(query, return_exceptions=True)
+            assert query.cancelled()
+            assert queue.active == 0
+            assert replica.outstanding == 0
+            # Dropping the connection cancels the MCP proxy's handler too
+            await wait_until(lambda: cancelled_requests["mcp"] == cancelled_before + 1)
+
+    asyncio.run(scenario())
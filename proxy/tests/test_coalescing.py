@@ -0,0 +1,22 @@
+import asyncio
+
+import main
+from bench.stub_backends import stub_backends
+from metrics import StageTimings, metrics
+
+def test_coalesced_queries_all_get_the_mcp_stage_timings(proxy_backends):
+    async def scenario():
+        async with stub_backends(mcp_latency=0.3), proxy_backends():
+            coalesced_before = metrics.coalesced_requests["mcp"]
+            timings = [StageTimings() for _ in range(3)]
+            responses = await asyncio.gather(*(
+                main.query_conversation("What is the weather today?", [], None, request_timings, shared=True)
+                for request_timings in timings
+            ))
+            assert all(response == responses[0] for response in responses)
+            assert metrics.coalesced_requests["mcp"] == coalesced_before + 2
+            for request_timings in timings:
+                assert request_timings.durations["mcp-llm"] >= 0.3
+                assert "mcp-tools" in request_timings.durations
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+import asyncio
+
+import httpx
+
+from health import CircuitBreaker, HealthMonitor
+
+def test_failed_probes_open_the_breaker_only_at_the_threshold():
+    async def scenario():
+        breaker = CircuitBreaker("STT replica", failure_threshold=3)
+        monitor = HealthMonitor({"stt": "http://stt/health"}, {"stt": breaker})
+        monitor.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+        try:
+            for _ in range(2):
+                await monitor.probe_all()
+                assert monitor.results["stt"]["healthy"] is False
+                assert breaker.state == "closed"
+            await monitor.probe_all()
+            assert breaker.state == "open"
+        finally:
+            await monitor.client.aclose()
+
+    asyncio.run(scenario())
+
+def test_successful_probe_resets_the_failure_count():
+    async def scenario():
+        statuses = iter([503, 503, 200, 503, 503])
+        breaker = CircuitBreaker("STT replica", failure_threshold=3)
+        monitor = HealthMonitor({"stt": "http://stt/health"}, {"stt": breaker})
+        monitor.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(next(statuses))))
+        try:
+            for _ in range(5):
+                await monitor.probe_all()
+            assert breaker.state == "closed"
+        finally:
+            await monitor.client.aclose()
+
+    asyncio.run(scenario())
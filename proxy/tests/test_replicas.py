@@ -0,0 +1,53 @@
+import asyncio
+
+from admission import AdmissionQueue
+from backends import ReplicaPool
+
+def make_pool() -> ReplicaPool:
+    return ReplicaPool("tts", ["http://tts-a", "http://tts-b"], timeout=5.0, concurrency=2, hedge_after=0.1)
+
+def open_breaker(pool: ReplicaPool, index: int):
+    breaker = pool.replicas[index].breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+def test_admitted_concurrency_follows_the_replicas_that_are_up():
+    pool = make_pool()
+    queue = AdmissionQueue("tts", pool.capacity)
+    assert queue.concurrency == 4
+    open_breaker(pool, 0)
+    assert queue.concurrency == 2
+    open_breaker(pool, 1)
+    assert queue.concurrency == 2 # one replica's worth, so trial calls can still get through
+    pool.replicas[0].breaker.record_success()
+    pool.replicas[1].breaker.record_success()
+    assert queue.concurrency == 4
+
+def test_waiters_are_admitted_when_the_limit_goes_up():
+    async def scenario():
+        pool = make_pool()
+        open_breaker(pool, 1)
+        queue = AdmissionQueue("tts", pool.capacity)
+        await queue.acquire(0, None)
+        await queue.acquire(0, None)
+        waiters = [asyncio.create_task(queue.acquire(0, None)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert queue.active == 2 and len(queue.waiters) == 3
+
+        pool.replicas[1].breaker.record_success()
+        queue.release_slot()
+        await asyncio.wait(waiters, timeout=1.0)
+        # The freed slot and the recovered replica's two
+        assert sum(waiter.done() for waiter in waiters) == 3
+        assert queue.active == 4
+
+    asyncio.run(scenario())
+
+def test_hedges_only_go_to_replicas_below_their_limit():
+    pool = make_pool()
+    primary, backup = pool.replicas
+    backup.outstanding = pool.concurrency
+    assert pool.pick(exclude=[primary], below_limit=True) is None
+    assert pool.pick(exclude=[primary]) is backup
+    backup.outstanding = pool.concurrency - 1
+    assert pool.pick(exclude=[primary], below_limit=True) is backup
@@ -0,0 +1,17 @@
+import time
+from collections import OrderedDict
+
+from audio_store import AudioStore
+from utils import evict_expired
+
+def test_evict_expired_drops_expired_then_oldest():
+    now = time.monotonic()
+    items = OrderedDict([("expired", (now - 1, "a")), ("old", (now + 60, "b")), ("new", (now + 60, "c"))])
+    evict_expired(items, max_items=1)
+    assert list(items) == ["new"]
+
+def test_audio_store_keeps_at_most_max_items():
+    store = AudioStore(ttl=60.0, max_items=2)
+    ids = [store.put(bytes([i])) for i in range(3)]
+    assert store.get(ids[0]) is None
+    assert store.get(ids[2]) == (bytes([2]), "audio/wav")
@@ -0,0 +1,37 @@
+import asyncio
+import io
+import json
+
+import main
+from bench.stub_backends import fake_response, fake_wav, stub_backends
+
+NUM_SENTENCES = 42
+
+def audio_form() -> tuple[dict, dict]:
+    form = {"use_tts": "true", "history": "[]"}
+    files = {"file": main.FileStorage(io.BytesIO(fake_wav(32_000)), filename="audio.wav", content_type="audio/wav")}
+    return form, files
+
+def test_long_answer_is_synthesized_in_full(proxy_backends):
+    # More sentences than the TTS queue holds (JARVIS_MAX_QUEUED, 32 by default)
+    answer = fake_response(NUM_SENTENCES * 52)
+    assert len(main.split_sentences(answer)) > main.backends.queues["tts"].max_queued
+
+    async def scenario():
+        async with stub_backends(tts_latency=0.02, response_chars=len(answer)), proxy_backends() as backends:
+            client = main.app.test_client()
+            form, files = audio_form()
+            response = await client.post("/proxy/audio-query", form=form, files=files)
+            body = await response.get_json()
+            assert "tts_wav" in body["response"]
+
+            form, files = audio_form()
+            response = await client.post("/proxy/audio-query/stream", form=form, files=files)
+            events = [json.loads(line) for line in (await response.get_data(as_text=True)).splitlines()]
+            types = [event["type"] for event in events]
+            assert "error" not in types
+            assert types.count("audio") == len(main.split_sentences(answer))
+            assert types[-1] == "done"
+            assert backends.queues["tts"].active == 0
+
+    asyncio.run(scenario())
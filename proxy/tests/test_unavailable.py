@@ -0,0 +1,23 @@
+import asyncio
+
+import main
+from health import BREAKER_FAILURE_THRESHOLD
+
+def test_unreachable_mcp_returns_json_503(proxy_backends):
+    # No stubs are running, so every connection to the MCP proxy is refused
+    async def scenario():
+        async with proxy_backends() as backends:
+            client = main.app.test_client()
+            for _ in range(BREAKER_FAILURE_THRESHOLD):
+                response = await client.post("/proxy/text-query", form={"query": "What is the weather today?", "history": "[]"})
+                assert response.status_code == 503
+                assert (await response.get_json()) == {"error": "MCP is unavailable"}
+
+            # The breaker is open now: the call fails fast and says when to retry
+            assert backends.mcp.replicas[0].breaker.state == "open"
+            response = await client.post("/proxy/text-query", form={"query": "What is the weather today?", "history": "[]"})
+            assert response.status_code == 503
+            assert (await response.get_json()) == {"error": "MCP is unavailable"}
+            assert 1 <= int(response.headers["Retry-After"]) <= backends.mcp.replicas[0].breaker.reset_timeout
+
+    asyncio.run(scenario())
@@ -0,0 +1,68 @@
+import io
+import re
+import time
+import wave
+from collections import OrderedDict
+
+from quart import Request
+from quart.formparser import FormDataParser
+
+MIN_SENTENCE_CHARS = 20 # Shorter fragments (e.g. "Mr.", "1.") are merged into the next sentence
+
+def split_sentences(text: str) -> list[str]:
+    """Split text into sentences for incremental synthesis"""
+    parts = [part.strip() for part in re.split(r"(?<=[.!?])\s+(?=[A-Z0-9\"'])|\n+", text.strip())]
+    sentences = []
+    pending = ""
+    for part in parts:
+        if not part:
+            continue
+        pending = f"{pending} {part}" if pending else part
+        if len(pending) >= MIN_SENTENCE_CHARS:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+def evict_expired(items: OrderedDict, max_items: int):
+    """
+    Drop expired entries of a TTL + LRU store, then the oldest ones while over max_items. Values are
+    tuples starting with their expiry time (time.monotonic()), oldest (or least recently used) first.
+    Entries share one TTL, so expired ones are always at the front.
+    """
+    now = time.monotonic()
+    while items:
+        expires_at = next(iter(items.values()))[0]
+        if expires_at > now and len(items) <= max_items:
+            break
+        items.popitem(last=False)
+
+def concat_wavs(wavs: list[bytes]) -> bytes:
+    """Join WAV files that share the same format into one WAV"""
+    if len(wavs) == 1:
+        return wavs[0]
+
+    output = io.BytesIO()
+    with wave.open(output, "wb") as out:
+        for i, data in enumerate(wavs):
+            with wave.open(io.BytesIO(data), "rb") as part:
+                if i == 0:
+                    out.setparams(part.getparams())
+                out.writeframes(part.readframes(part.getnframes()))
+    return output.getvalue()
+
+def in_memory_stream_factory(total_content_length, content_type, filename, content_length=None):
+    return io.BytesIO()
+
+class InMemoryFormDataParser(FormDataParser):
+    """Keeps uploaded files in memory instead of spooling large ones to a temp file"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, stream_factory=in_memory_stream_factory, **kwargs)
+
+class InMemoryRequest(Request):
+    form_data_parser_class = InMemoryFormDataParser
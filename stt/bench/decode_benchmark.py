@@ -0,0 +1,76 @@
+"""
+Compare uploading raw 16-bit WAV (what the frontends send today) against compressed Opus
+in WebM/OGG: bytes per query, in-memory decode cost on the STT server, and transfer time
+at a few link speeds.
+
+Run from the stt directory:
+    python -m bench.decode_benchmark --input test_audio_files/audio.mp3
+"""
+import argparse
+import io
+import statistics
+import time
+
+import av
+import numpy as np
+from faster_whisper.audio import decode_audio
+
+SAMPLE_RATE = 16000
+LINK_SPEEDS_MBIT = (1, 5, 20)
+
+def encode_wav(samples: np.ndarray) -> bytes:
+    """Same layout as the frontends' utils.encodeWAV: 16-bit mono PCM"""
+    return encode(samples, "wav", "pcm_s16le", SAMPLE_RATE, None)
+
+def encode(samples: np.ndarray, container_format: str, codec: str, rate: int, bit_rate: int | None) -> bytes:
+    output = io.BytesIO()
+    with av.open(output, mode="w", format=container_format) as container:
+        stream = container.add_stream(codec, rate=rate)
+        stream.layout = "mono"
+        if bit_rate:
+            stream.bit_rate = bit_rate
+
+        frame = av.AudioFrame.from_ndarray((samples * 32767).astype(np.int16)[None, :], format="s16", layout="mono")
+        frame.sample_rate = SAMPLE_RATE
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=rate, frame_size=stream.codec_context.frame_size or None)
+        for resampled in resampler.resample(frame) + resampler.resample(None):
+            for packet in stream.encode(resampled):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return output.getvalue()
+
+def time_decode(data: bytes, repeats: int) -> float:
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        decode_audio(io.BytesIO(data), sampling_rate=SAMPLE_RATE)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+def main(input_path: str, repeats: int, bit_rate: int):
+    samples = decode_audio(input_path, sampling_rate=SAMPLE_RATE)
+    duration = len(samples) / SAMPLE_RATE
+    print(f"input: {input_path} ({duration:.1f}s of audio)\n")
+
+    variants = {
+        "wav (pcm_s16le)": encode_wav(samples),
+        f"webm (opus {bit_rate // 1000}k)": encode(samples, "webm", "libopus", 48000, bit_rate),
+        f"ogg (opus {bit_rate // 1000}k)": encode(samples, "ogg", "libopus", 48000, bit_rate),
+    }
+
+    header = f"{'format':<20} {'bytes':>10} {'decode':>9}" + "".join(f" {f'total@{speed}Mbit':>14}" for speed in LINK_SPEEDS_MBIT)
+    print(header)
+    for name, data in variants.items():
+        decode = time_decode(data, repeats)
+        # Upload time plus decode time, the part of the request that depends on the format
+        totals = "".join(f" {(len(data) * 8 / (speed * 1_000_000) + decode) * 1000:>12.1f}ms" for speed in LINK_SPEEDS_MBIT)
+        print(f"{name:<20} {len(data):>10} {decode * 1000:>7.1f}ms{totals}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default="test_audio_files/audio.mp3")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--bit-rate", type=int, default=24000)
+    args = parser.parse_args()
+    main(args.input, args.repeats, args.bit_rate)
@@ -1,9 +1,29 @@
 from faster_whisper import WhisperModel
-from quart import Quart, request, jsonify
+from faster_whisper.audio import decode_audio
+from quart import Quart, Request, request, jsonify
+from quart.formparser import FormDataParser
 from quart_cors import cors
+import asyncio
+import io
 import torch
 
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+
+def in_memory_stream_factory(total_content_length, content_type, filename, content_length=None):
+    return io.BytesIO()
+
+class InMemoryFormDataParser(FormDataParser):
+    """Keeps uploaded files in memory instead of spooling large ones to a temp file"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, stream_factory=in_memory_stream_factory, **kwargs)
+
+class InMemoryRequest(Request):
+    form_data_parser_class = InMemoryFormDataParser
+
 app = Quart(__name__)
+app.request_class = InMemoryRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
 app = cors(app, allow_origin="*") # TODO: change later
 
 device_type = "cuda" if (torch.cuda.is_available()) else "cpu"
@@ -21,8 +41,15 @@ def load_model(model_size):
     # Run on GPU with FP16
     model = WhisperModel(model_size, device=device_type, compute_type=compute_type)
 
-def transcribe_wav_file(wav_file):
-    segments, info = model.transcribe(wav_file, beam_size=5, vad_filter=True, language="en", vad_parameters={"threshold": 0.6, "neg_threshold": 0.3})
+def decode_upload(audio_file):
+    """
+    Decode an uploaded audio file (WAV, Opus in WebM/OGG, MP3, ...) to 16kHz mono samples.
+    Decoding happens from memory with PyAV, the upload is never written to disk.
+    """
+    return decode_audio(io.BytesIO(audio_file.read()), sampling_rate=model.feature_extractor.sampling_rate)
+
+def transcribe_audio(audio):
+    segments, info = model.transcribe(audio, beam_size=5, vad_filter=True, language="en", vad_parameters={"threshold": 0.6, "neg_threshold": 0.3})
     print("Detected language '%s' with probability %f" % (info.language, info.language_probability))
     return segments
 
@@ -38,13 +65,19 @@ async def health_check():
 
 @app.route('/transcribe', methods=['POST'])
 async def transcribe():
-    """Endpoint to transcribe audio files"""
+    """Endpoint to transcribe audio files. Decoding and transcription run in a thread, so /health stays responsive"""
     files = await request.files
     if 'file' not in files:
         return jsonify({'error': "No file part in the request"}), 400
     file = (await request.files)['file']
     try:
-        transcription = process_segments(transcribe_wav_file(file))
+        audio = await asyncio.to_thread(decode_upload, file)
+    except Exception as e:
+        print(f'Could not decode audio: {e}')
+        return jsonify({'error': f'Unsupported or corrupt audio: {e}'}), 400
+    try:
+        # segments is a lazy generator, the transcription runs while it is consumed
+        transcription = await asyncio.to_thread(lambda: process_segments(transcribe_audio(audio)))
         return jsonify({'transcription': transcription}), 200
     except Exception as e:
         print(f'Unexpected error: {e}')
@@ -104,6 +104,10 @@ def main() -> None:
     app = Flask(__name__)
     CORS(app, allow_origin="*") # TODO: Configure CORS properly for production use
 
+    @app.route("/health", methods=["GET"])
+    def app_health():
+        return {"status": "healthy"}
+
     @app.route("/", methods=["GET", "POST"])
     def app_synthesize() -> bytes:
         if request.method == "POST":